@@ -1,15 +1,28 @@
+import signal
 import asyncio
 
 from modules.helpers.utils import choose_mode
 from modules.core.trading_manager import TradingManager
+from modules.core.session_pool import session_pool
+from modules.core.market_data import market_data
+from modules.core.account_stream import account_streams
+from modules.core.account_limits import account_limit_tracker
+from modules.helpers.metrics import request_metrics
+from modules.helpers.fill_store import fill_store
+from settings import FLATTEN_ON_STOP
 
 
-async def run_mode(mode: str):
-    manager = TradingManager()
+TRADING_MODES = ("futures_trading", "delta_neutral_liquidations", "default_liquidations", "close_positions")
+JOURNALED_MODES = ("delta_neutral_liquidations", "default_liquidations")
+
+
+async def dispatch(manager: TradingManager, mode: str):
     if mode == "futures_trading":
         await manager.start_trading()
     elif mode == "close_positions":
         await manager.close_all_positions()
+    elif mode == "emergency_flatten":
+        await manager.emergency_flatten()
     elif mode == "parse_accounts_data":
         await manager.parse_accounts_data(manager.accounts, True)
     elif mode == "delta_neutral_liquidations":
@@ -20,6 +33,45 @@ async def run_mode(mode: str):
         await manager.withdraw_all_balances()
 
 
+async def run_mode(mode: str):
+    manager = TradingManager()
+    loop = asyncio.get_running_loop()
+    mode_task = asyncio.create_task(dispatch(manager, mode))
+    stop_signals = []
+
+    def stop(sig: signal.Signals):
+        stop_signals.append(sig)
+        mode_task.cancel()
+        for handled in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(handled)
+
+    if hasattr(signal, "SIGUSR1"):
+        loop.add_signal_handler(
+            signal.SIGUSR1,
+            lambda: asyncio.create_task(request_metrics.dump())
+        )
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop, sig)
+        except NotImplementedError:
+            pass
+
+    try:
+        await mode_task
+    except asyncio.CancelledError:
+        if not stop_signals:
+            raise
+    finally:
+        if stop_signals and mode in TRADING_MODES and (FLATTEN_ON_STOP or mode not in JOURNALED_MODES):
+            await manager.emergency_flatten(f"received {stop_signals[0].name}")
+        await account_limit_tracker.stop()
+        await account_streams.stop_all()
+        await market_data.stop()
+        await session_pool.close_all()
+        await request_metrics.dump()
+        fill_store.close()
+
+
 if __name__ == '__main__':
     selected_mode = choose_mode()
     if selected_mode:
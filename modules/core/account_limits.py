@@ -0,0 +1,87 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from modules.helpers.logger import debug, warning
+from modules.helpers.utils import get_last_thursday_timestamp
+
+
+@dataclass
+class AccountCounters:
+    volume: float = 0
+    pnl: float = 0
+    liquidations: int = 0
+
+
+class AccountLimitTracker:
+    RECONCILE_INTERVAL = 60 * 30
+
+    def __init__(self):
+        self.counters: dict[str, AccountCounters] = {}
+        self.week_start = get_last_thursday_timestamp()
+        self._task: asyncio.Task | None = None
+
+    def get(self, account_id: str) -> AccountCounters | None:
+        return self.counters.get(account_id)
+
+    def roll_week(self):
+        week_start = get_last_thursday_timestamp()
+        if week_start == self.week_start:
+            return
+        self.week_start = week_start
+        for counters in self.counters.values():
+            counters.volume = 0
+            counters.pnl = 0
+            counters.liquidations = 0
+
+    def update(self, accounts_data: list[dict]):
+        for account_data in accounts_data:
+            if not account_data:
+                continue
+            self.counters[account_data["account_id"]] = AccountCounters(
+                volume=account_data["statistics"]["volume"]["week"],
+                pnl=account_data["statistics"]["pnl"]["week"],
+                liquidations=account_data["statistics"]["liquidations"]["week"],
+            )
+
+    def record_order(self, account_id: str, volume: float):
+        counters = self.counters.get(account_id)
+        if counters is not None:
+            counters.volume += volume
+
+    def record_pnl(self, account_id: str, pnl: float):
+        counters = self.counters.get(account_id)
+        if counters is not None:
+            counters.pnl += pnl
+
+    def record_liquidation(self, account_id: str):
+        counters = self.counters.get(account_id)
+        if counters is not None:
+            counters.liquidations += 1
+
+    def start(self, reconcile: Callable[[], Awaitable[list[dict]]]):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(reconcile))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, reconcile: Callable[[], Awaitable[list[dict]]]):
+        while True:
+            await asyncio.sleep(self.RECONCILE_INTERVAL)
+            try:
+                self.update(await reconcile())
+                await debug(f"Limits | Reconciled counters for {len(self.counters)} accounts", telegram=False)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await warning(f"Limits | Reconciliation failed, keeping in-memory counters: {e}", telegram=False)
+
+
+account_limit_tracker = AccountLimitTracker()
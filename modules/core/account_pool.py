@@ -0,0 +1,50 @@
+from modules.core.backpack import Backpack
+
+
+class AccountPool:
+    def __init__(self, accounts: list[list[Backpack]]):
+        self.accounts: dict[str, list[Backpack]] = {}
+        self.subs: dict[str, Backpack] = {}
+        self._available: list[str] = []
+        self._index: dict[str, int] = {}
+        for account in accounts:
+            self.add(account)
+
+    def __len__(self) -> int:
+        return len(self._available)
+
+    def add(self, account: list[Backpack]):
+        account_id = account[0].account_id
+        if account_id in self.accounts:
+            return
+        self.accounts[account_id] = account
+        if len(account) > 1:
+            self.subs[account_id] = account[1]
+        self.release(account)
+
+    def get(self, account_id: str) -> list[Backpack] | None:
+        return self.accounts.get(account_id)
+
+    def is_available(self, account_id: str) -> bool:
+        return account_id in self._index
+
+    def available(self) -> list[list[Backpack]]:
+        return [self.accounts[account_id] for account_id in self._available]
+
+    def all(self) -> list[list[Backpack]]:
+        return list(self.accounts.values())
+
+    def lease(self, account: list[Backpack]) -> list[Backpack]:
+        index = self._index.pop(account[0].account_id)
+        last = self._available.pop()
+        if index < len(self._available):
+            self._available[index] = last
+            self._index[last] = index
+        return account
+
+    def release(self, account: list[Backpack]):
+        account_id = account[0].account_id
+        if account_id in self._index or account_id not in self.accounts:
+            return
+        self._index[account_id] = len(self._available)
+        self._available.append(account_id)
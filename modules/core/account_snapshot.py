@@ -0,0 +1,48 @@
+from dataclasses import dataclass
+from time import monotonic
+
+
+@dataclass
+class AccountSnapshot:
+    net_equity: float
+    net_equity_available: float
+    net_equity_locked: float
+    borrow_liability: float
+    total: dict[str, float]
+    available: dict[str, float]
+    has_balances: bool
+    timestamp: float
+
+    @classmethod
+    def from_responses(cls, collateral: dict, capital: dict | None = None):
+        total = {}
+        available = {}
+        for balance in collateral["collateral"]:
+            total[balance["symbol"]] = float(balance["totalQuantity"])
+            available[balance["symbol"]] = float(balance["availableQuantity"])
+
+        for token_name, balance in (capital or {}).items():
+            if token_name not in total:
+                total[token_name] = float(balance["available"])
+            if token_name not in available:
+                available[token_name] = float(balance["available"])
+
+        return cls(
+            net_equity=float(collateral.get("netEquity", 0)),
+            net_equity_available=float(collateral["netEquityAvailable"]),
+            net_equity_locked=float(collateral.get("netEquityLocked", 0)),
+            borrow_liability=float(collateral.get("borrowLiability", 0)),
+            total=total,
+            available=available,
+            has_balances=capital is not None,
+            timestamp=monotonic(),
+        )
+
+    @property
+    def age(self) -> float:
+        return monotonic() - self.timestamp
+
+    def apply_fill(self, notional: float, leverage: int):
+        margin = notional / leverage
+        self.net_equity_available -= margin
+        self.net_equity_locked += margin
@@ -0,0 +1,216 @@
+import asyncio
+from collections import deque
+from time import monotonic
+
+import aiohttp
+
+from modules.core.backpack import Backpack
+from modules.core.market_data import MarketDataService
+from modules.core.models import Position, PositionEvent, Fill
+from modules.helpers.logger import debug, warning
+from modules.helpers.utils import request_proxy_format
+
+
+class AccountStream:
+    WS_URL = MarketDataService.WS_URL
+    STREAMS = ["account.positionUpdate", "account.orderUpdate"]
+    RESYNC_INTERVAL = 60
+    POLL_INTERVAL = 1
+    RECONNECT_DELAY = [1, 60]
+    FILLS_HISTORY = 500
+    CLOSED_ORDER_EVENTS = {"orderCancelled", "orderExpired"}
+
+    def __init__(self, account: Backpack):
+        self.account = account
+        self.positions: dict[str, Position] = {}
+        self.orders: dict[str, dict] = {}
+        self.fills: deque[Fill] = deque(maxlen=self.FILLS_HISTORY)
+        self.connected = False
+        self.version = 0
+        self.last_sync = 0.0
+        self._dirty = True
+        self._event = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._sync_lock = asyncio.Lock()
+        self._subscribers: set[asyncio.Queue] = set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.connected = False
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    async def get_positions(self) -> list[Position]:
+        self.start()
+        max_age = self.RESYNC_INTERVAL if self.connected else self.POLL_INTERVAL
+        if self._dirty or monotonic() - self.last_sync >= max_age:
+            await self._sync(max_age)
+        return list(self.positions.values())
+
+    def subscribe(self) -> asyncio.Queue:
+        self.start()
+        queue = asyncio.Queue()
+        for position in self.positions.values():
+            queue.put_nowait(PositionEvent.diff(None, position))
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue | None):
+        self._subscribers.discard(queue)
+
+    @staticmethod
+    def drain(queue: asyncio.Queue) -> list[PositionEvent]:
+        events = []
+        while not queue.empty():
+            events.append(queue.get_nowait())
+        return events
+
+    def _publish(self, previous: Position | None, current: Position | None):
+        event = PositionEvent.diff(previous, current)
+        if event is None:
+            return
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+    async def wait_for_update(self, timeout: float, version: int | None = None) -> bool:
+        self.start()
+        if version is not None and version != self.version:
+            return True
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _notify(self):
+        self.version += 1
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def _sync(self, max_age: float = RESYNC_INTERVAL):
+        async with self._sync_lock:
+            if not self._dirty and monotonic() - self.last_sync < max_age:
+                return
+            self._dirty = False
+            previous = self.positions
+            self.positions = {position.symbol: position for position in await self.account.get_futures_positions()}
+            for symbol in previous.keys() | self.positions.keys():
+                self._publish(previous.get(symbol), self.positions.get(symbol))
+            self.last_sync = monotonic()
+            self._notify()
+
+    def _on_message(self, message: dict):
+        data = message.get("data") or {}
+        event = data.get("e", "")
+        stream = message.get("stream", "")
+
+        if stream.endswith("positionUpdate"):
+            if event == "positionClosed":
+                self._publish(self.positions.pop(data["s"], None), None)
+            else:
+                position = self.positions.get(data["s"])
+                if position is None:
+                    position = self.positions[data["s"]] = Position.from_ws(data)
+                    self._publish(None, position)
+                else:
+                    previous = position.copy()
+                    position.update(data, Position.WS_FIELDS)
+                    self._publish(previous, position)
+
+        elif stream.endswith("orderUpdate"):
+            order_id = data.get("i")
+            if event == "orderFill":
+                self.fills.append(Fill.from_ws(data))
+            if event in self.CLOSED_ORDER_EVENTS or data.get("X") == "Filled":
+                self.orders.pop(order_id, None)
+            else:
+                self.orders[order_id] = data
+
+        else:
+            return
+
+        self._notify()
+
+    async def _run(self):
+        delay = self.RECONNECT_DELAY[0]
+        req_proxy = request_proxy_format(self.account.proxy)
+        proxy = req_proxy["https"] if req_proxy else None
+
+        while True:
+            try:
+                headers = self.account.build_headers("subscribe", {})
+                async with aiohttp.ClientSession() as session:
+                    async with session.ws_connect(self.WS_URL, proxy=proxy, heartbeat=30) as ws:
+                        await ws.send_json({
+                            "method": "SUBSCRIBE",
+                            "params": self.STREAMS,
+                            "signature": [
+                                headers["X-API-Key"],
+                                headers["X-Signature"],
+                                headers["X-Timestamp"],
+                                headers["X-Window"],
+                            ],
+                        })
+                        self.mark_dirty()
+                        await self._sync()
+                        self.connected = True
+                        delay = self.RECONNECT_DELAY[0]
+                        await debug(f"Account Stream | Subscribed to account updates for {self.account.account_id}", telegram=False)
+
+                        async for msg in ws:
+                            if msg.type != aiohttp.WSMsgType.TEXT:
+                                break
+                            self._on_message(msg.json())
+
+                raise Exception("stream closed by server")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.connected = False
+                self._notify()
+                await warning(f"Account Stream | Stream dropped for {self.account.account_id}: {e}. Using REST, reconnecting in {delay}s", telegram=False)
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.RECONNECT_DELAY[1])
+
+
+class AccountStreams:
+    def __init__(self):
+        self._streams: dict[str, AccountStream] = {}
+
+    def get(self, account: Backpack) -> AccountStream:
+        stream = self._streams.get(account.api_key)
+        if stream is None:
+            stream = self._streams[account.api_key] = AccountStream(account)
+        return stream
+
+    async def wait_for_any(self, accounts: list[Backpack], timeout: float, versions: dict[str, int] | None = None) -> bool:
+        versions = versions or {}
+        waiters = [
+            asyncio.create_task(self.get(account).wait_for_update(timeout, versions.get(account.api_key)))
+            for account in accounts
+        ]
+        done, pending = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        return any(task.result() for task in done)
+
+    async def stop_all(self):
+        for stream in self._streams.values():
+            await stream.stop()
+        self._streams.clear()
+
+
+account_streams = AccountStreams()
@@ -1,23 +1,39 @@
 import asyncio
 
 from modules.core.browser import Browser
-from modules.helpers.retry import async_retry
+from modules.core.account_snapshot import AccountSnapshot
+from modules.core.models import Position, Ticker
+from modules.helpers.retry import async_retry, ResponseError, POLL_POLICY, ORDER_POLICY
+from modules.helpers.cache import cached, response_cache
+from modules.helpers.fill_store import fill_store, FILLS, LIQUIDATIONS
+from modules.helpers.statistics import StatisticsAggregator
 from modules.helpers.logger import debug
 from time import time
-from datetime import datetime
 
 
 class Backpack(Browser):
+    PRICES_TTL = 2
+    DEPOSIT_ADDRESS_TTL = 60 * 60 * 24
+    ACCOUNT_INFO_TTL = 5
+    SNAPSHOT_MAX_AGE = 5
+    HISTORY_WINDOW = 60 * 60 * 24 * 30
+    HISTORY_PAGE_SIZE = 1000
+    HISTORY_CONCURRENCY = 4
+
     def __init__(self, account_id: str, api_key: str, api_secret: str, proxy: str, backpack_deposit_address: str | None):
         super().__init__(api_key, api_secret, proxy, account_id)
         self.account_id = account_id
         self.backpack_deposit_address = backpack_deposit_address
+        self.history_semaphore = asyncio.Semaphore(self.HISTORY_CONCURRENCY)
+        self.settings: dict | None = None
+        self.snapshot: AccountSnapshot | None = None
         
+    @cached(DEPOSIT_ADDRESS_TTL)
     @async_retry("Get Deposit Address")
     async def get_deposit_address(self):
         response = await self.send_request(
             method="GET",
-            url=f"https://api.backpack.exchange/wapi/v1/capital/deposit/address",
+            url=f"{self.BACKPACK_WAPI}/capital/deposit/address",
             params={"blockchain": "Solana"},
             api_instruction="depositAddressQuery",
 
@@ -27,196 +43,91 @@ class Backpack(Browser):
             raise Exception(f"Unexpected response: {data}")
         return data["address"]
 
-    @async_retry("Get Account Statistics")
-    async def get_account_statistics(self, last_reset_timestamp: int):
-        offset = 0
-        fills = []
-        month_timestamp = int(time() - 60 * 60 * 24 * 30)
-
-        while True:
+    async def _get_fills_page(self, params: dict, offset: int) -> list[dict]:
+        async with self.history_semaphore:
             response = await self.send_request(
                 method="GET",
-                url="https://api.backpack.exchange/wapi/v1/history/fills",
-                params={
-                    "limit": 1000,
-                    "offset": offset,
-                },
+                url=f"{self.BACKPACK_WAPI}/history/fills",
+                params={**params, "offset": offset},
                 api_instruction="fillHistoryQueryAll"
             )
-            if response.status_code != 200:
-                raise Exception(f"Unexpected response <{response.status_code}> offset: {offset}: {response.text}")
-            current_fills = response.json()
-            fills.extend(current_fills)
-            if len(current_fills) == 1000:
-                offset += 1000
-            else:
-                break
-        
-        positions = {}
-        for fill in fills:
-            symbol = fill["symbol"]
-            quantity = fill["quantity"]
-            side = fill["side"]
-            volume = float(fill["price"]) * float(quantity)
-            timestamp = datetime.fromisoformat(fill["timestamp"]).timestamp()
-            
-            key = f"{symbol}_{quantity}"
-            if key not in positions:
-                positions[key] = []
-            positions[key].append({
-                "side": side,
-                "volume": volume,
-                "timestamp": timestamp
-            })
-
-        week_pnl = 0
-        month_pnl = 0
-
-        for position_fills in positions.values():
-            i = 0
-            while i < len(position_fills) - 1:
-                open_fill = position_fills[i]
-                close_fill = position_fills[i + 1]
-                
-                if (
-                        open_fill["side"] == "Bid" and close_fill["side"] == "Ask" or
-                        open_fill["side"] == "Ask" and close_fill["side"] == "Bid"
-                ):
-                    pnl = close_fill["volume"] - open_fill["volume"] if open_fill["side"] == "Bid" \
-                        else open_fill["volume"] - close_fill["volume"]
-                    
-                    if close_fill["timestamp"] >= last_reset_timestamp:
-                        week_pnl += pnl
-                    if close_fill["timestamp"] >= month_timestamp:
-                        month_pnl += pnl
-                
-                i += 2
-
-        week_volume = round(sum([
-            float(fill["price"]) * float(fill["quantity"])
-            for fill in fills
-            if datetime.fromisoformat(fill["timestamp"]).timestamp() >= last_reset_timestamp
-        ]), 2)
-
-        month_volume = round(sum([
-            float(fill["price"]) * float(fill["quantity"])
-            for fill in fills
-            if datetime.fromisoformat(fill["timestamp"]).timestamp() >= month_timestamp
-        ]), 2)
-
-        week_days = len(set([
-            datetime.fromisoformat(fill["timestamp"]).strftime('%Y-%m-%d')
-            for fill in fills
-            if datetime.fromisoformat(fill["timestamp"]).timestamp() >= last_reset_timestamp
-        ]))
-
-        month_days = len(set([
-            datetime.fromisoformat(fill["timestamp"]).strftime('%Y-%m-%d')
-            for fill in fills
-            if datetime.fromisoformat(fill["timestamp"]).timestamp() >= month_timestamp
-        ]))
+        if response.status_code != 200:
+            raise ResponseError(response, f"Unexpected response <{response.status_code}> offset: {offset}: {response.text}")
+        return response.json()
 
-        week_orders = len(set([
-            fill["orderId"]
-            for fill in fills
-            if datetime.fromisoformat(fill["timestamp"]).timestamp() >= last_reset_timestamp
-        ]))
+    @async_retry("Sync Fills")
+    async def sync_fills(self, kind: str = FILLS):
+        async with fill_store.lock(self.api_key, kind):
+            now = int(time() * 1000)
+            cursor = fill_store.get_cursor(self.api_key, kind) or 0
+            params = {
+                "limit": self.HISTORY_PAGE_SIZE,
+                "from": max(cursor, now - self.HISTORY_WINDOW * 1000),
+                "to": now,
+                "sortDirection": "Asc",
+            }
+            if kind == LIQUIDATIONS:
+                params.update({"fillType": "AllLiquidation", "marketType": "PERP"})
 
-        month_orders = len(set([
-            fill["orderId"]
-            for fill in fills
-            if datetime.fromisoformat(fill["timestamp"]).timestamp() >= month_timestamp
-        ]))
+            pages = [await self._get_fills_page(params, 0)]
+            offset = self.HISTORY_PAGE_SIZE
+            while True:
+                for page in pages:
+                    fill_store.add_fills(self.api_key, kind, page)
+                    if len(page) < self.HISTORY_PAGE_SIZE:
+                        return
 
-        liquidations = await self.get_liquidations()
+                pages = await asyncio.gather(*[
+                    self._get_fills_page(params, offset + i * self.HISTORY_PAGE_SIZE)
+                    for i in range(self.HISTORY_CONCURRENCY)
+                ])
+                offset += self.HISTORY_CONCURRENCY * self.HISTORY_PAGE_SIZE
 
-        week_liquidations = len([
-            fill
-            for fill in liquidations
-            if datetime.fromisoformat(fill["timestamp"]).timestamp() >= last_reset_timestamp
-        ])
+    async def get_account_statistics(self, last_reset_timestamp: int):
+        month_timestamp = int(time() - self.HISTORY_WINDOW)
+        await asyncio.gather(self.sync_fills(FILLS), self.sync_fills(LIQUIDATIONS))
 
-        month_liquidations = len([
-            fill
-            for fill in liquidations
-            if datetime.fromisoformat(fill["timestamp"]).timestamp() >= month_timestamp
-        ])
+        statistics = StatisticsAggregator(last_reset_timestamp, month_timestamp)
+        for fill in fill_store.iter_fills(self.api_key, FILLS, since=month_timestamp):
+            statistics.add_fill(*fill)
+        for *_, ts in fill_store.iter_fills(self.api_key, LIQUIDATIONS, since=month_timestamp):
+            statistics.add_liquidation(ts)
 
-        return {
-            "pnl": {
-                "week": round(week_pnl, 6),
-                "month": round(month_pnl, 6)
-            },
-            "volume": {
-                "week": week_volume,
-                "month": month_volume
-            },
-            "active_days": {
-                "week": week_days,
-                "month": month_days
-            },
-            "orders": {
-                "week": week_orders,
-                "month": month_orders
-            },
-            "liquidations": {
-                "week": week_liquidations,
-                "month": month_liquidations
-            }
-        }
+        return statistics.result()
 
-    @async_retry("Get Prices")
-    async def get_prices(self, futures_only=False):
+    @cached(PRICES_TTL, shared=True)
+    @async_retry("Get Tickers", policy=POLL_POLICY)
+    async def get_tickers(self) -> list[Ticker]:
         response = await self.send_request(
             method="GET",
             url=f"{self.BACKPACK_API}/tickers",
         )
-        prices = {
-            ticker["symbol"].replace("_USDC", "").replace("_PERP", ""): float(ticker["lastPrice"])
-            for ticker in response.json()
-            if not futures_only or ticker["symbol"].endswith("_PERP")
-        }
-        prices["USDC"] = 1
-        return prices
-
-    @async_retry("Get Balances")
-    async def get_balances(self, net_equity=False, balances_and_equity=False):
-        response = await self.send_request(
-            method="GET",
-            url=f"{self.BACKPACK_API}/capital/collateral",
-            api_instruction="collateralQuery"
-        )
-        usdc_equity = {
-            'USDC': float(response.json()["netEquityAvailable"]),
-        }
-        if net_equity:
-            return usdc_equity
-
-        if balances_and_equity:
-            balances = {
-                balance["symbol"]: float(balance["availableQuantity"])
-                for balance in response.json()["collateral"]
-            }
-        else:
-            balances = {
-                balance["symbol"]: float(balance["totalQuantity"])
-                for balance in response.json()["collateral"]
-            }
-
-        response = await self.send_request(
-            method="GET",
-            url=f"{self.BACKPACK_API}/capital",
-            api_instruction="balanceQuery"
-        )
+        if response.status_code != 200:
+            raise ResponseError(response)
+        return [Ticker.from_api(ticker) for ticker in response.json()]
 
-        for token_name in response.json():
-            if balances.get(token_name) is None:
-                balances[token_name] = float(response.json()[token_name]["available"])
+    async def _get_json(self, url: str, api_instruction: str) -> dict:
+        response = await self.send_request(method="GET", url=url, api_instruction=api_instruction)
+        if response.status_code != 200:
+            raise ResponseError(response)
+        return response.json()
 
-        if balances_and_equity:
-            return usdc_equity, balances
+    @async_retry("Get Snapshot", policy=POLL_POLICY)
+    async def get_snapshot(self, max_age: float = 0, balances: bool = True) -> AccountSnapshot:
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.age <= max_age and (snapshot.has_balances or not balances):
+            return snapshot
 
-        return balances
+        if balances:
+            collateral, capital = await asyncio.gather(
+                self._get_json(f"{self.BACKPACK_API}/capital/collateral", "collateralQuery"),
+                self._get_json(f"{self.BACKPACK_API}/capital", "balanceQuery"),
+            )
+        else:
+            collateral = await self._get_json(f"{self.BACKPACK_API}/capital/collateral", "collateralQuery")
+            capital = None
+        self.snapshot = AccountSnapshot.from_responses(collateral, capital)
+        return self.snapshot
 
     @async_retry("Change Leverage")
     async def change_leverage(self, leverage: int) -> bool:
@@ -228,16 +139,26 @@ class Backpack(Browser):
         )
         
         if response.status_code != 200:
-            raise Exception(f"Failed: <{response.status_code}> {response.text}")
-            
-        account_info = await self.get_account_info()
-        if account_info.get("leverageLimit") != str(leverage):
-            raise Exception(f"Leverage change verification failed: {response.text}")
-            
+            raise ResponseError(response, f"Failed: <{response.status_code}> {response.text}")
+
+        response_cache.invalidate(self.account_id, "get_account_info")
+        self.snapshot = None
+        self.settings = {**(self.settings or {}), "leverageLimit": str(leverage)}
         await debug(f"Backpack | Changed leverage to {leverage} for {self.account_id}")
-        return account_info
+        return True
+
+    async def get_leverage(self) -> int:
+        if self.settings is None:
+            self.settings = await self.get_account_info()
+        return int(self.settings["leverageLimit"])
+
+    async def ensure_leverage(self, leverage: int) -> bool:
+        if await self.get_leverage() == leverage:
+            return False
+        return await self.change_leverage(leverage)
     
-    @async_retry("Get Account Info")
+    @cached(ACCOUNT_INFO_TTL)
+    @async_retry("Get Account Info", policy=POLL_POLICY)
     async def get_account_info(self):
         response = await self.send_request(
             method="GET",
@@ -245,41 +166,22 @@ class Backpack(Browser):
             api_instruction="accountQuery",
         )
         if response.status_code != 200:
-            raise Exception(f"Failed: <{response.status_code}> {response.text}")
-        return response.json()
+            raise ResponseError(response, f"Failed: <{response.status_code}> {response.text}")
+        self.settings = response.json()
+        return self.settings
 
-    @async_retry("Get Token Decimals")
-    async def get_token_decimals(self) -> dict:
+    @async_retry("Get Markets", policy=POLL_POLICY)
+    async def get_markets(self) -> list[dict]:
         response = await self.send_request(
             method="GET",
             url=f"{self.BACKPACK_API}/markets",
             api_instruction="marketsQuery"
         )
-        
-        futures_decimals = {}
-        
-        for market in response.json():
-            if not market["symbol"].endswith("_PERP"):
-                continue
-                
-            min_quantity = market["filters"]["quantity"]["minQuantity"]
-            min_price = market["filters"]["price"]["minPrice"]
-            min_tick_size = market["filters"]["price"].get("tickSize", "0")
-            
-            quantity_decimals = len(min_quantity.split('.')[1]) if '.' in min_quantity else 0
-            price_decimals = len(min_price.split('.')[1]) if '.' in min_price else 0
-            tick_size_decimals = len(min_tick_size.split('.')[1]) if '.' in min_tick_size else 0
-            
-            token_name = market["baseSymbol"]
-            futures_decimals[token_name] = {
-                "amount": quantity_decimals,
-                "price": price_decimals,
-                "tick_size": tick_size_decimals
-            }
-            
-        return futures_decimals
-    
-    @async_retry("Create Order")
+        if response.status_code != 200:
+            raise ResponseError(response)
+        return response.json()
+
+    @async_retry("Create Order", policy=ORDER_POLICY)
     async def create_order(self, payload: dict):
         response = await self.send_request(
             method="POST",
@@ -287,43 +189,66 @@ class Backpack(Browser):
             json=payload,
             api_instruction="orderExecute",
         )
-        return response.json()
+        result = response.json()
+        self._apply_fills([payload], [result])
+        return result
     
-    @async_retry("Get Futures Positions")
-    async def get_futures_positions(self, attempt=0):
-        try:
-            response = await self.send_request(
-                method="GET",
-                url=f"{self.BACKPACK_API}/position",
-                api_instruction="positionQuery",
-            )
-            if response.status_code != 200:
-                raise Exception(f"Unexpected response <{response.status_code}>: {response.text}")
-        except Exception as e:
-            if 'Failed to perform, curl: (16)' in str(e) and attempt < 3:
-                await asyncio.sleep(30)
-                return await self.get_futures_positions(attempt=attempt+1)
-            else:
-                raise e
-        return response.json()
+    @async_retry("Create Orders", policy=ORDER_POLICY)
+    async def create_orders(self, payloads: list[dict]) -> list[dict]:
+        response = await self.send_request(
+            method="POST",
+            url=f"{self.BACKPACK_API}/orders",
+            json=payloads,
+            api_instruction="orderExecute",
+        )
+        if response.status_code != 200:
+            self.snapshot = None
+            raise ResponseError(response, f"Unexpected response <{response.status_code}>: {response.text}")
+        results = response.json()
+        self._apply_fills(payloads, results)
+        return results
+
+    def _apply_fills(self, payloads: list[dict], results: list[dict]):
+        if self.snapshot is None:
+            return
+        if self.settings is None:
+            self.snapshot = None
+            return
+        leverage = int(self.settings["leverageLimit"])
+        for payload, result in zip(payloads, results):
+            notional = float(result.get("executedQuoteQuantity") or 0)
+            if notional and not payload.get("reduceOnly"):
+                self.snapshot.apply_fill(notional, leverage)
+
+    @async_retry("Get Futures Positions", policy=POLL_POLICY)
+    async def get_futures_positions(self) -> list[Position]:
+        response = await self.send_request(
+            method="GET",
+            url=f"{self.BACKPACK_API}/position",
+            api_instruction="positionQuery",
+        )
+        if response.status_code != 200:
+            raise ResponseError(response)
+        return [Position.from_api(position) for position in response.json()]
     
     @async_retry("Withdraw")
     async def withdraw(self, address: str, amount: float, symbol: str = 'USDC', blockchain='Solana'):
         response = await self.send_request(
             method="POST",
-            url=f"https://api.backpack.exchange/wapi/v1/capital/withdrawals",
+            url=f"{self.BACKPACK_WAPI}/capital/withdrawals",
             json={"address": address, "quantity": amount, "symbol": symbol, "blockchain": blockchain},
             api_instruction="withdraw",
         )
+        self.snapshot = None
         if response.status_code != 200:
             if response.json().get('message'):
-                raise Exception(f"Unexpected response <{response.status_code}>: {response.json()['message']}")
-            raise Exception(f"Unexpected response <{response.status_code}>: {response.json()}")
+                raise ResponseError(response, f"Unexpected response <{response.status_code}>: {response.json()['message']}")
+            raise ResponseError(response, f"Unexpected response <{response.status_code}>: {response.json()}")
         if response.json()['status'] not in ('pending', 'confirmed', 'success'):
             raise Exception(f"Failed to withdraw: {response.json()}")
         return response.json()
     
-    @async_retry("Get Max Order Size")
+    @async_retry("Get Max Order Size", policy=POLL_POLICY)
     async def get_max_order_size(self, symbol: str, side: str):
         response = await self.send_request(
             method="GET",
@@ -335,33 +260,7 @@ class Backpack(Browser):
             raise Exception(f"Unexpected response for {symbol} {side}: {response.json()}")
         return float(response.json()["maxOrderQuantity"])
     
-    @async_retry("Get Liquidations")
-    async def get_liquidations(self):
-        offset = 0
-        fills = []
-
-        while True:
-            response = await self.send_request(
-                method="GET",
-                url="https://api.backpack.exchange/wapi/v1/history/fills",
-                params={
-                    "limit": 1000,
-                    "offset": offset,
-                    "fillType": "AllLiquidation",
-                    "marketType": "PERP"
-                },
-                api_instruction="fillHistoryQueryAll"
-            )
-            current_fills = response.json()
-            fills.extend(current_fills)
-            if len(current_fills) == 1000:
-                offset += 1000
-            else:
-                break
-
-        return fills
-
-    @async_retry("Get Transferable Amount")
+    @async_retry("Get Transferable Amount", policy=POLL_POLICY)
     async def get_transferable_amount(self, symbol: str):
         response = await self.send_request(
             method="GET",
@@ -373,7 +272,7 @@ class Backpack(Browser):
             raise Exception(f"Unexpected response for {symbol}: {response.json()}")
         return float(response.json()["maxWithdrawalQuantity"])
 
-    @async_retry("Get Borrow Amount")
+    @async_retry("Get Borrow Amount", policy=POLL_POLICY)
     async def get_borrow_amount(self):
         response = await self.send_request(
             method="GET",
@@ -381,7 +280,7 @@ class Backpack(Browser):
             api_instruction="borrowLendPositionQuery",
         )
         if response.status_code != 200:
-            raise Exception(f"Unexpected response <{response.status_code}>: {response.text}")
+            raise ResponseError(response)
         for item in response.json():
             if item['symbol'] == 'USDC':
                 return float(item['netExposureQuantity'])
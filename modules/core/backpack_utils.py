@@ -4,28 +4,32 @@ import asyncio
 from modules.helpers.logger import success, debug, warning
 from modules.helpers.utils import save_accounts_statistics, get_last_thursday_timestamp, round_to_decimals
 from modules.core.backpack import Backpack
+from modules.core.models import Position
+from modules.core.account_limits import account_limit_tracker
+from modules.core.market_data import market_data
+from modules.core.account_stream import account_streams
+from modules.core.margin import margin_engine
 from modules.core.okx import okx_withdraw
 
 
 class BackpackUtils:
     ACCOUNTS_PATH = "accounts.json"
 
-    async def parse_accounts_data(self, accounts: list[Backpack], is_parse_mode=False, log=True, sub_accounts: list[Backpack] = None):
+    async def parse_accounts_data(self, accounts: list[Backpack], is_parse_mode=False, log=True, sub_accounts: dict[str, Backpack] = None):
         if log:
             await debug('Parse Statistic | Parsing accounts data...')
-        prices = await accounts[0].get_prices()
+        prices = await market_data.get_prices(accounts[0])
         last_reset_timestamp = get_last_thursday_timestamp()
 
         async def process_account(account: Backpack):
             try:
                 account.backpack_deposit_address = await account.get_deposit_address()
-                balances = await account.get_balances()
+                balances = dict((await account.get_snapshot()).total)
 
                 if sub_accounts:
-                    sub_accs = [sub for sub in sub_accounts if sub.account_id.startswith(account.account_id)]
-                    if sub_accs:
-                        sub_account = sub_accs[0]
-                        sub_balances = await sub_account.get_balances()
+                    sub_account = sub_accounts.get(account.account_id)
+                    if sub_account:
+                        sub_balances = (await sub_account.get_snapshot()).total
                         for token in sub_balances:
                             if token in balances:
                                 balances[token] += sub_balances[token]
@@ -64,16 +68,22 @@ class BackpackUtils:
 
         return results
 
-    def _filter_available_accounts_for_liquidation(self, accounts_data, account_limits, accounts: list[list[Backpack]]) -> list[list[Backpack]]:
+    async def track_account_limits(self, accounts: list[Backpack], sub_accounts: dict[str, Backpack] = None):
+        async def reconcile():
+            return await self.parse_accounts_data(accounts, log=False, sub_accounts=sub_accounts)
+
+        account_limit_tracker.update(await reconcile())
+        account_limit_tracker.start(reconcile)
+
+    def _filter_available_accounts_for_liquidation(self, accounts: list[list[Backpack]], account_limits) -> list[list[Backpack]]:
         available_accounts = []
+        account_limit_tracker.roll_week()
 
-        for account_data in accounts_data:
-            if not account_data:
+        for backpack in accounts:
+            counters = account_limit_tracker.get(backpack[0].account_id)
+            if counters is None:
                 continue
 
-            account_id = account_data["account_id"]
-            backpack = [acc for acc in accounts if acc[0].account_id == account_id][0]
-
             limits = account_limits[backpack[0].api_key]
             volume_limit = limits["volume_limit"]
             liquidation_limit = limits["liquidation_limit"]
@@ -81,11 +91,11 @@ class BackpackUtils:
             if (
                     (
                             volume_limit != 0 and
-                            account_data["statistics"]["volume"]['week'] >= volume_limit
+                            counters.volume >= volume_limit
                     ) or
                     (
                             liquidation_limit != 0 and
-                            account_data["statistics"]["liquidations"]['week'] >= liquidation_limit
+                            counters.liquidations >= liquidation_limit
                     )
             ):
                 continue
@@ -99,15 +109,16 @@ class BackpackUtils:
             required_margin *= 1.05
 
             main_account, sub_account = account
-            net_equity, balances = await main_account.get_balances(balances_and_equity=True)
-            net_equity = net_equity.get('USDC')
+            snapshot = await main_account.get_snapshot(max_age=main_account.SNAPSHOT_MAX_AGE)
+            net_equity = snapshot.net_equity_available
+            balances = snapshot.available
 
             if net_equity > required_margin and balances.get('USDC'):
                 if net_equity - balances['USDC'] > required_margin:
                     excess = round_to_decimals(balances['USDC'] - random.uniform(0.001, 0.01), 5)
                 else:
                     excess = round_to_decimals(balances['USDC'] - required_margin, 5)
-                excess = min(round_to_decimals(await main_account.get_transferable_amount('USDC') * 0.95, 3), excess)
+                excess = min(round_to_decimals(await margin_engine.get_withdrawable(main_account) * 0.95, 3), excess)
                 if excess > 0.005:
                     await main_account.withdraw(
                         sub_account.backpack_deposit_address,
@@ -119,7 +130,7 @@ class BackpackUtils:
 
             elif net_equity < required_margin:
                 while net_equity < required_margin:
-                    sub_balance = (await sub_account.get_balances()).get("USDC", 0)
+                    sub_balance = (await sub_account.get_snapshot()).total.get("USDC", 0)
                     
                     if sub_balance <= 0.0001:
                         break
@@ -134,7 +145,7 @@ class BackpackUtils:
                         )
                         await success(f"Backpack | Successfully withdrew {transfer_amount} USDC from {sub_account.account_id} to {main_account.account_id}")
                         await asyncio.sleep(3)
-                        net_equity = (await main_account.get_balances(net_equity=True)).get("USDC", 0)
+                        net_equity = (await main_account.get_snapshot()).net_equity_available
                     else:
                         break
 
@@ -146,7 +157,7 @@ class BackpackUtils:
                     )
                     for _ in range(60):
                         await asyncio.sleep(5)
-                        new_balance = (await main_account.get_balances(net_equity=True)).get("USDC", 0)
+                        new_balance = (await main_account.get_snapshot()).net_equity_available
 
                         if new_balance > net_equity:
                             await success(
@@ -167,7 +178,7 @@ class BackpackUtils:
                     k = 1
                 else:
                     k = 0.99
-            transfer_amount = round_to_decimals(await main_account.get_transferable_amount('USDC') * k, 6)
+            transfer_amount = round_to_decimals(await margin_engine.get_withdrawable(main_account, verify=mode_run) * k, 6)
 
             if transfer_amount > 0:
                 await main_account.withdraw(
@@ -191,21 +202,16 @@ class BackpackUtils:
                 await warning(f"Backpack | Failed to withdraw free balance ({transfer_amount} USDC) on sub for {account[0].account_id}: {e}")
             return False
 
-    async def get_position_size(self, account: Backpack, token: str) -> float:
-        positions = await account.get_futures_positions()
+    async def get_position(self, account: Backpack, token: str) -> Position | None:
+        positions = await account_streams.get(account).get_positions()
         for pos in positions:
-            if pos["symbol"] == f"{token}_USDC_PERP":
-                return abs(float(pos.get("netExposureNotional", 0)))
-        return 0
-
-    async def monitor_position_changes(
-        self,
-        account: Backpack,
-        token: str,
-    ) -> tuple[bool, float]:
-        current_size = await self.get_position_size(account, token)
-        is_liquidated = current_size == 0
-        return is_liquidated, current_size
+            if pos.symbol == f"{token}_USDC_PERP":
+                return pos
+        return None
+
+    async def get_position_size(self, account: Backpack, token: str) -> float:
+        position = await self.get_position(account, token)
+        return abs(position.net_exposure_notional) if position else 0
 
     async def get_all_deposit_addresses(self, account_pairs: list[list[Backpack]]):
         for pair in account_pairs:
@@ -1,15 +1,20 @@
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 from base64 import b64encode, b64decode
 
-from curl_cffi.requests import AsyncSession
-from time import time
+from time import time, perf_counter
 from json import dumps
+from urllib.parse import urlparse
 
-from modules.helpers.utils import request_proxy_format
+from modules.core.session_pool import session_pool
+from modules.core.rate_limiter import rate_limiter
+from modules.helpers.retry import ResponseError
+from modules.helpers.metrics import request_metrics
+from modules.data.constants import BACKPACK_URL
 
 
 class Browser:
-    BACKPACK_API = "https://api.backpack.exchange/api/v1"
+    BACKPACK_API = f"{BACKPACK_URL}/api/v1"
+    BACKPACK_WAPI = f"{BACKPACK_URL}/wapi/v1"
 
     def __init__(
             self,
@@ -24,58 +29,65 @@ class Browser:
         self.account_name = account_name
 
         self.proxy = proxy
-        self.req_proxy = request_proxy_format(self.proxy)
-
-        self.session = self.get_new_session()
-
-    def get_new_session(self):
-        session = AsyncSession(
-            impersonate="chrome131",
-            headers={
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.1.1 Safari/605.1.1",
-                "Origin": "https://backpack.exchange",
-                "Referer": "https://backpack.exchange/",
-            }
-        )
-        if self.req_proxy:
-            session.proxies.update(self.req_proxy)
-
-        return session
 
     async def send_request(self, **kwargs):
-        if kwargs.get("api_instruction") is not None:
-            headers = kwargs.get("headers", {})
-            headers.update(
-                self.build_headers(
-                    kwargs["api_instruction"],
-                    {**kwargs.get("params", {}), **kwargs.get("json", {})},
+        instruction = kwargs.pop("api_instruction", None)
+
+        async with rate_limiter.acquire(self.api_key if instruction else None, self.proxy, instruction):
+            if instruction is not None:
+                headers = kwargs.get("headers", {})
+                payload = kwargs.get("json", {})
+                headers.update(
+                    self.build_headers(
+                        instruction,
+                        payload if isinstance(payload, list) else {**kwargs.get("params", {}), **payload},
+                    )
                 )
+                kwargs["headers"] = headers
+
+            label = instruction or urlparse(kwargs["url"]).path.rsplit("/", 1)[-1]
+            bytes_sent = len(dumps(kwargs["json"])) if kwargs.get("json") else 0
+            started = perf_counter()
+            try:
+                if kwargs.get("session"):
+                    session = kwargs["session"]
+                    del kwargs["session"]
+                    response = await session.request(**kwargs)
+                else:
+                    async with session_pool.lease(self.proxy) as session:
+                        response = await session.request(**kwargs)
+            except Exception as e:
+                request_metrics.record(label, self.account_name, self.proxy, perf_counter() - started, e.__class__.__name__, bytes_sent)
+                raise
+
+            request_metrics.record(
+                label,
+                self.account_name,
+                self.proxy,
+                perf_counter() - started,
+                response.status_code,
+                bytes_sent,
+                len(response.content),
             )
-            kwargs["headers"] = headers
-            del kwargs["api_instruction"]
 
-        if kwargs.get("session"):
-            session = kwargs["session"]
-            del kwargs["session"]
-        else:
-            session = self.session
+        if response.status_code == 429:
+            raise ResponseError(response)
+        return response
 
-        return await session.request(**kwargs)
-
-    def build_headers(self, method: str, params: dict):
+    def build_headers(self, method: str, params: dict | list[dict]):
         timestamp = str(int(time() * 1e3))
         window = "10000"
 
-        body = {
-            key: dumps(value) if type(value) == bool else value
-            for key, value in sorted(params.items())
-        }
-        body.update({
-            "timestamp": timestamp,
-            "window": window,
-        })
         instruction = f"instruction={method}&" if method else ""
-        str_body = instruction + "&".join(f"{key}={value}" for key, value in body.items())
+        orders = params if isinstance(params, list) else [params]
+        parts = [
+            (instruction + "&".join(
+                f"{key}={dumps(value) if type(value) == bool else value}"
+                for key, value in sorted(order.items())
+            )).rstrip("&")
+            for order in orders
+        ]
+        str_body = "&".join([part for part in parts if part] + [f"timestamp={timestamp}&window={window}"])
         signature = self.private_key.sign(str_body.encode())
         encoded_signature = b64encode(signature).decode()
 
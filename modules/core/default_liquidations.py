@@ -1,12 +1,17 @@
 import asyncio
 import random
-import time
 from typing import TypedDict
 from dataclasses import dataclass
 from modules.core.backpack import Backpack
+from modules.core.account_pool import AccountPool
 from modules.core.position_manager import PositionManager
+from modules.core.market_registry import market_registry
 from modules.core.backpack_utils import BackpackUtils
+from modules.core.account_stream import account_streams
+from modules.core.liquidation_scheduler import liquidation_scheduler
+from modules.core.account_limits import account_limit_tracker
 from modules.helpers.logger import error, info, warning, debug
+from modules.helpers.journal import RunJournal
 from settings import DEFAULT_LIQUIDATION_SETTINGS, ORDERS_TIMEOUT, RETRY
 
 
@@ -25,52 +30,21 @@ class AccountData:
 
 class DefaultLiquidation(BackpackUtils):
     LEVERAGE = 50
-    CACHE_LIFETIME = 600
+    JOURNAL_PATH = "database/journal_default_liquidation.jsonl"
 
-    def __init__(self, accounts: list[list[Backpack]], position_manager: PositionManager, account_limits):
+    def __init__(self, accounts: AccountPool, position_manager: PositionManager, account_limits):
         self.accounts = accounts
         self.position_manager = position_manager
         self.account_limits = account_limits
-        self.futures_decimals = {}
         self.accounts_lock = asyncio.Lock()
         self.active_accounts: dict[str, AccountData] = {}
-        self._cached_parse_data = None
-        self._cache_timestamp = 0
+        self.journal = RunJournal(self.JOURNAL_PATH)
 
-    async def _get_available_accounts(self) -> list[list[Backpack]]:
-        current_time = time.time()
-        
-        need_update = False
-        
-        if not self._cached_parse_data or current_time - self._cache_timestamp >= self.CACHE_LIFETIME:
-            need_update = True
-        else:
-            cached_account_ids = {data["account_id"] for data in self._cached_parse_data}
-            current_account_ids = {acc[0].account_id for acc in self.accounts}
-            
-            if not current_account_ids.issubset(cached_account_ids):
-                need_update = True
-        
-        if need_update:
-            self._cached_parse_data = await self.parse_accounts_data(
-                [acc[0] for acc in self.accounts],
-                log=False,
-                sub_accounts=[acc[1] for acc in self.accounts]
-            )
-            self._cache_timestamp = current_time
-        
-        current_accounts_data = [
-            data for data in self._cached_parse_data 
-            if any(acc[0].account_id == data["account_id"] for acc in self.accounts)
-        ]
-        
-        available_accounts = self._filter_available_accounts_for_liquidation(
-            current_accounts_data,
-            self.account_limits,
-            self.accounts
+    def _get_available_accounts(self) -> list[list[Backpack]]:
+        return self._filter_available_accounts_for_liquidation(
+            self.accounts.available(),
+            self.account_limits
         )
-        
-        return available_accounts
 
     async def _select_account(self) -> list[Backpack] | None:
         async with self.accounts_lock:
@@ -78,14 +52,13 @@ class DefaultLiquidation(BackpackUtils):
                 await warning("Backpack | No more accounts available for trading")
                 return None
 
-            available_accounts = await self._get_available_accounts()
+            available_accounts = self._get_available_accounts()
             if not available_accounts:
                 await warning("Backpack | No more accounts available for trading")
                 return None
 
             selected_account = random.choice(available_accounts)
-            self.accounts.remove(selected_account)
-            return selected_account
+            return self.accounts.lease(selected_account)
 
     async def _try_open_position(
         self,
@@ -173,19 +146,8 @@ class DefaultLiquidation(BackpackUtils):
             await self.position_manager.close_all_positions([account_data.account[0]], log=False)
             return False
 
-    async def _check_account_limits(self, account: list[Backpack]) -> bool:
-        accounts_data = await self.parse_accounts_data(
-            accounts=[account[0]],
-            log=False,
-            sub_accounts=[account[1]]
-        )
-        if not self._filter_available_accounts_for_liquidation(
-                accounts_data,
-                self.account_limits,
-                [account]
-        ):
-            return False
-        return True
+    def _check_account_limits(self, account: list[Backpack]) -> bool:
+        return bool(self._filter_available_accounts_for_liquidation([account], self.account_limits))
 
     async def _handle_liquidation(self, account_data: AccountData, liquidated_token: str, log=True) -> bool:
         try:
@@ -194,7 +156,7 @@ class DefaultLiquidation(BackpackUtils):
 
             account_data.state["tokens"].remove(liquidated_token)
             
-            if not await self._check_account_limits(account_data.account):
+            if not self._check_account_limits(account_data.account):
                 await warning(f"{account_data.log_prefix} | Account limits exceeded or not enough funds, opening new position skipped...")
                 return len(account_data.state["tokens"]) > 0
 
@@ -235,11 +197,13 @@ class DefaultLiquidation(BackpackUtils):
                 account_data.state["last_reinvest_pnl"][token] = current_pnl
             return withdraw_success
 
-    async def manage_account(self, account: list[Backpack], log_prefix: str) -> None:
+    async def manage_account(self, account: list[Backpack], log_prefix: str, state: AccountState = None) -> None:
+        events = None
+        cancelled = False
         try:
             account_data = AccountData(
                 account=account,
-                state={
+                state=state or {
                     "direction": "",
                     "tokens": [],
                     "last_reinvest_pnl": {}
@@ -247,27 +211,36 @@ class DefaultLiquidation(BackpackUtils):
                 log_prefix=log_prefix
             )
 
-            if not await self._initialize_positions(account_data):
+            if state:
+                await info(f"{log_prefix} | Resumed {account_data.state['direction']} positions from journal")
+            elif not await self._initialize_positions(account_data):
                 raise Exception("Failed to initialize positions")
 
             self.active_accounts[account[0].account_id] = account_data
             await info(f"{log_prefix} | Started monitoring {len(account_data.state['tokens'])} positions")
+            stream = account_streams.get(account[0])
+            events = stream.subscribe()
 
             while account_data.state["tokens"]:
-                positions = await account[0].get_futures_positions()
-                current_tokens = {pos["symbol"].split("_")[0]: pos for pos in positions}
+                self.journal.save(account[0].account_id, account_data.state)
+                positions = await stream.get_positions()
+                version = stream.version
+                current_tokens = {pos.token: pos for pos in positions}
 
                 for token in account_data.state["tokens"]:
                     if token not in current_tokens:
+                        account_limit_tracker.record_liquidation(account[0].account_id)
                         if not await self._handle_liquidation(account_data, token):
                             return
 
-                for token, position in current_tokens.items():
-                    if token not in account_data.state["tokens"]:
+                changed_tokens = {event.token for event in stream.drain(events) if event.position}
+                for token in changed_tokens:
+                    position = current_tokens.get(token)
+                    if position is None or token not in account_data.state["tokens"]:
                         continue
 
-                    total_pnl = float(position["pnlUnrealized"]) + float(position["pnlRealized"])
-                    position_value = abs(float(position["netExposureNotional"]))
+                    total_pnl = position.pnl_unrealized + position.pnl_realized
+                    position_value = abs(position.net_exposure_notional)
                     leverage = self.position_manager.get_token_leverage(token)
                     current_pnl = total_pnl / position_value * 100 * leverage
 
@@ -292,29 +265,70 @@ class DefaultLiquidation(BackpackUtils):
                         new_profit_usdc = (new_profit_percent / (100 * leverage)) * position_value
                         await self.reinvest_profit(account_data, token, new_profit_usdc, current_pnl)
 
-                await asyncio.sleep(5)
+                liquidation_scheduler.update(account[0].account_id, positions)
+                await liquidation_scheduler.wait(
+                    account[0].account_id,
+                    [account[0]],
+                    DEFAULT_LIQUIDATION_SETTINGS["poll_interval"],
+                    {account[0].api_key: version}
+                )
 
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
         except Exception as e:
             await error(f"{log_prefix} | Account management error: {e}")
         finally:
-            if account[0].account_id in self.active_accounts:
-                del self.active_accounts[account[0].account_id]
-            await self.position_manager.close_all_positions([account[0]])
+            account_streams.get(account[0]).unsubscribe(events)
+            liquidation_scheduler.remove(account[0].account_id)
+            if not cancelled:
+                self.active_accounts.pop(account[0].account_id, None)
+                await self.position_manager.close_all_positions([account[0]])
+                self.journal.remove(account[0].account_id)
             async with self.accounts_lock:
-                if account not in self.accounts:
-                    self.accounts.append(account)
+                self.accounts.release(account)
 
     async def _close_all_active_positions(self):
-        for account_data in self.active_accounts.values():
-            await self.position_manager.close_all_positions([account_data.account[0]], log=False)
+        if self.active_accounts:
+            await self.position_manager.flatten_all(
+                [account_data.account[0] for account_data in self.active_accounts.values()],
+                reason="liquidation trading stopped"
+            )
+            for account_id in self.active_accounts:
+                self.journal.remove(account_id)
+            self.active_accounts.clear()
+
+    async def _restore_accounts(self) -> list[tuple[list[Backpack], AccountState]]:
+        restored = []
+        for account_id, state in self.journal.load().items():
+            account = self.accounts.get(account_id)
+            if account is None:
+                await warning(f"Backpack | Journaled account {account_id} is unknown, skipping it")
+                self.journal.remove(account_id)
+                continue
+            if not self.accounts.is_available(account_id):
+                await warning(f"Backpack | Journaled account {account_id} is already in use, keeping its record for the next start")
+                continue
+
+            positions = await account_streams.get(account[0]).get_positions()
+            live_tokens = [pos.token for pos in positions if pos.net_quantity != 0]
+            if not live_tokens:
+                await info(f"Backpack | Journaled account {account_id} has no open positions left, dropping it")
+                self.journal.remove(account_id)
+                continue
+
+            state["tokens"] = list(dict.fromkeys(state["tokens"] + live_tokens))
+            restored.append((self.accounts.lease(account), state))
+        return restored
 
     async def start_liquidation_trading(self):
         active_tasks: set[asyncio.Task] = set()
+        cancelled = False
         
         try:
-            self.futures_decimals = await self.accounts[0][0].get_token_decimals()
-            self.position_manager.futures_decimals = self.futures_decimals
-            await self.get_all_deposit_addresses(self.accounts)
+            await market_registry.load(self.accounts.all()[0][0])
+            await self.get_all_deposit_addresses(self.accounts.all())
+            await self.track_account_limits([acc[0] for acc in self.accounts.all()], self.accounts.subs)
             
             num_parallel = random.randint(*DEFAULT_LIQUIDATION_SETTINGS["number_of_parallel_accounts"])
             await info(f"Backpack | Starting {num_parallel} parallel accounts")
@@ -331,7 +345,12 @@ class DefaultLiquidation(BackpackUtils):
                 await asyncio.sleep(random.uniform(*DEFAULT_LIQUIDATION_SETTINGS["account_delay"]))
                 return True
 
-            for _ in range(num_parallel):
+            for account, state in await self._restore_accounts():
+                task = asyncio.create_task(self.manage_account(account, account[0].account_id, state=state))
+                task.add_done_callback(active_tasks.discard)
+                active_tasks.add(task)
+
+            for _ in range(num_parallel - len(active_tasks)):
                 if not await start_new_task():
                     break
 
@@ -340,28 +359,27 @@ class DefaultLiquidation(BackpackUtils):
                     if not await start_new_task():
                         break
 
-                try:
-                    done, pending = await asyncio.wait(
-                        active_tasks,
-                        return_when=asyncio.FIRST_COMPLETED,
-                        timeout=60
-                    )
-                    
-                    if not done and not pending:
-                        if not await self._select_account():
-                            await warning("Backpack | No more accounts available for trading")
-                            break
-                    
-                    for task in done:
-                        try:
-                            await task
-                        except Exception as e:
-                            await error(f"Backpack | Task error: {e}")
-                    
-                except asyncio.CancelledError:
-                    await info("Liquidation trading cancelled, closing positions...")
-                    break
-
+                done, pending = await asyncio.wait(
+                    active_tasks,
+                    return_when=asyncio.FIRST_COMPLETED,
+                    timeout=60
+                )
+                
+                if not done and not pending:
+                    if not await self._select_account():
+                        await warning("Backpack | No more accounts available for trading")
+                        break
+                
+                for task in done:
+                    try:
+                        await task
+                    except Exception as e:
+                        await error(f"Backpack | Task error: {e}")
+
+        except asyncio.CancelledError:
+            cancelled = True
+            await info("Liquidation trading stopped, positions are kept open and will be resumed from the journal")
+            raise
         except Exception as e:
             raise Exception(f"Critical error in liquidation trading: {e}")
         finally:
@@ -373,5 +391,6 @@ class DefaultLiquidation(BackpackUtils):
                     await asyncio.wait_for(asyncio.wait(active_tasks), timeout=30.0)
                 except asyncio.TimeoutError:
                     await warning("Shutdown timeout after 30s")
-                
-            await self._close_all_active_positions()
+
+            if not cancelled:
+                await self._close_all_active_positions()
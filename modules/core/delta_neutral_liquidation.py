@@ -5,9 +5,16 @@ from typing import TypedDict
 from dataclasses import dataclass
 
 from modules.core.backpack import Backpack
+from modules.core.models import Position
+from modules.core.account_pool import AccountPool
 from modules.core.position_manager import PositionManager
+from modules.core.market_registry import market_registry
 from modules.core.backpack_utils import BackpackUtils
+from modules.core.account_stream import account_streams
+from modules.core.liquidation_scheduler import liquidation_scheduler
+from modules.core.account_limits import account_limit_tracker
 from modules.helpers.logger import error, info, warning
+from modules.helpers.journal import RunJournal
 from modules.helpers.utils import calculate_short_positions
 from settings import DELTA_NEUTRAL_SETTINGS
 
@@ -33,34 +40,23 @@ class DeltaNeutralLiquidation(BackpackUtils):
     PAIR_STATE_ACTIVE = "active"
     PAIR_STATE_PARTIAL_LIQUIDATION = "partial_liquidation"
     PAIR_STATE_CLOSED = "closed"
+    JOURNAL_PATH = "database/journal_delta_neutral.jsonl"
 
-    def __init__(self, accounts: list[list[Backpack]], position_manager: PositionManager, account_limits):
+    def __init__(self, accounts: AccountPool, position_manager: PositionManager, account_limits):
         self.accounts = accounts
         self.position_manager = position_manager
         self.account_limits = account_limits
-        self.futures_decimals = {}
         self.accounts_lock = asyncio.Lock()
+        self.journal = RunJournal(self.JOURNAL_PATH)
 
     async def _select_accounts(self, accounts_needed: int) -> tuple[list[Backpack] | None, list[list[Backpack]]]:
         async with self.accounts_lock:
-            unique_accounts = []
-            for acc in self.accounts:
-                if not [i for i in unique_accounts if i[0].account_id == acc[0].account_id]:
-                    unique_accounts.append(acc)
-            self.accounts = unique_accounts
-
             if len(self.accounts) < accounts_needed:
                 return None, []
 
-            accounts_data = await self.parse_accounts_data(
-                [acc[0] for acc in self.accounts],
-                log=False,
-                sub_accounts=[acc[1] for acc in self.accounts]
-            )
             available_accounts = self._filter_available_accounts_for_liquidation(
-                accounts_data,
-                self.account_limits,
-                self.accounts
+                self.accounts.available(),
+                self.account_limits
             )
 
             if len(available_accounts) < accounts_needed:
@@ -71,7 +67,7 @@ class DeltaNeutralLiquidation(BackpackUtils):
             short_accounts = random.sample(available_accounts, accounts_needed - 1)
 
             for account in [long_account] + short_accounts:
-                self.accounts.remove(account)
+                self.accounts.lease(account)
 
             return long_account, short_accounts
 
@@ -105,14 +101,15 @@ class DeltaNeutralLiquidation(BackpackUtils):
     async def handle_main_liquidation(self, pair_data: PairData):
         try:
             await info(f"{pair_data.log_prefix} | Main {pair_data.main_direction} position liquidated on {pair_data.main_account[0].account_id}, closing all hedges")
+            account_limit_tracker.record_liquidation(pair_data.main_account[0].account_id)
             await self.position_manager.close_all_positions(
                 [pair_data.main_account[0]] + [acc[0] for acc in pair_data.hedge_accounts],
                 log=False
             )
             async with self.accounts_lock:
-                self.accounts.append(pair_data.main_account)
+                self.accounts.release(pair_data.main_account)
                 for hedge in pair_data.hedge_accounts:
-                    self.accounts.append(hedge)
+                    self.accounts.release(hedge)
             return True
         except Exception as e:
             raise Exception(f"Error handling main position liquidation: {e}")
@@ -120,6 +117,7 @@ class DeltaNeutralLiquidation(BackpackUtils):
     async def handle_hedge_liquidation(self, pair_data: PairData, liquidated_account: list[Backpack]) -> bool:
         try:
             await info(f"{pair_data.log_prefix} | Hedge position liquidated on {liquidated_account[0].account_id}, adjusting position")
+            account_limit_tracker.record_liquidation(liquidated_account[0].account_id)
             liquidated_size = next(
                 size for acc, size in zip(pair_data.hedge_accounts, pair_data.initial_states['hedge_sizes'])
                 if acc[0].account_id == liquidated_account[0].account_id
@@ -142,7 +140,7 @@ class DeltaNeutralLiquidation(BackpackUtils):
             pair_data.initial_states['hedge_sizes'].remove(liquidated_size)
             
             async with self.accounts_lock:
-                self.accounts.append(liquidated_account)
+                self.accounts.release(liquidated_account)
                 
             if not pair_data.hedge_accounts:
                 await info(f"{pair_data.log_prefix} | All hedge positions liquidated, closing pair...")
@@ -151,15 +149,70 @@ class DeltaNeutralLiquidation(BackpackUtils):
                     log=False,
                 )
                 async with self.accounts_lock:
-                    self.accounts.append(pair_data.main_account)
+                    self.accounts.release(pair_data.main_account)
                 return True
             return False
         except Exception as e:
             raise Exception(f"Error handling hedge liquidation: {e}")
 
-    async def run_single_pair(self, log_prefix: str) -> bool:
+    def _journal_pair(self, pair_data: PairData, state: str, partial_liquidation: dict | None):
+        self.journal.save(pair_data.main_account[0].account_id, {
+            "main": pair_data.main_account[0].account_id,
+            "hedges": [acc[0].account_id for acc in pair_data.hedge_accounts],
+            "token": pair_data.token,
+            "initial_states": pair_data.initial_states,
+            "main_direction": pair_data.main_direction,
+            "state": state,
+            "partial_liquidation": partial_liquidation,
+        })
+
+    async def _restore_pairs(self) -> list[tuple[PairData, dict]]:
+        restored = []
+        for record in self.journal.load().values():
+            accounts = [self.accounts.get(account_id) for account_id in [record["main"]] + record["hedges"]]
+            if not all(accounts):
+                await warning(f"Backpack | Journaled pair with {record['main']} references unknown accounts, skipping it")
+                self.journal.remove(record["main"])
+                continue
+            if not all(self.accounts.is_available(acc[0].account_id) for acc in accounts):
+                await warning(f"Backpack | Journaled pair with {record['main']} uses accounts already in use, keeping its record for the next start")
+                continue
+            for account in accounts:
+                self.accounts.lease(account)
+            restored.append((
+                PairData(
+                    main_account=accounts[0],
+                    hedge_accounts=accounts[1:],
+                    token=record["token"],
+                    initial_states=record["initial_states"],
+                    log_prefix=f"Resumed-{len(restored) + 1}",
+                    main_direction=record["main_direction"]
+                ),
+                record
+            ))
+        return restored
+
+    async def run_single_pair(self, log_prefix: str, resume: tuple[PairData, dict] = None) -> bool:
         selected_accounts = []
         try:
+            if resume:
+                pair_data, record = resume
+                selected_accounts = [pair_data.main_account] + pair_data.hedge_accounts
+                sizes = await asyncio.gather(*[
+                    self.get_position_size(acc[0], pair_data.token) for acc in selected_accounts
+                ])
+                if not any(sizes):
+                    await info(f"{log_prefix} | Journaled pair with {record['main']} has no open positions left, dropping it")
+                    self.journal.remove(record["main"])
+                    async with self.accounts_lock:
+                        for acc in selected_accounts:
+                            self.accounts.release(acc)
+                    return False
+
+                await info(f"{log_prefix} | Resumed pair with {record['main']} (main {pair_data.main_direction}) from journal")
+                await self._monitor_pair(pair_data, record["state"], record["partial_liquidation"])
+                return True
+
             accounts_in_pair = random.randint(*DELTA_NEUTRAL_SETTINGS['accounts_in_pair'])
             main_account, hedge_accounts = await self._select_accounts(accounts_in_pair)
             if not main_account:
@@ -208,79 +261,110 @@ class DeltaNeutralLiquidation(BackpackUtils):
             )
 
             await info(f"{log_prefix} | Monitoring liquidations for pair with {main_account[0].account_id} (main {main_direction})")
-            state = self.PAIR_STATE_ACTIVE
-            partial_liquidation = None
-
-            while state != self.PAIR_STATE_CLOSED:
-                await asyncio.sleep(8)
-
-                if state == self.PAIR_STATE_PARTIAL_LIQUIDATION:
-                    if await self._handle_partial_liquidation(pair_data, partial_liquidation):
-                        break
-                    continue
-
-                is_liquidated, current_size = await self.monitor_position_changes(
-                    pair_data.main_account[0],
-                    pair_data.token
-                )
-
-                if is_liquidated:
-                    await self.handle_main_liquidation(pair_data)
-                    break
-                elif current_size < pair_data.initial_states["main"] * 0.99:
-                    state = self.PAIR_STATE_PARTIAL_LIQUIDATION
-                    partial_liquidation = {
-                        "account_id": pair_data.main_account[0].account_id,
-                        "start_time": time.time(),
-                        "initial_size": pair_data.initial_states["main"]
-                    }
-                    continue
-
-                for hedge_account in pair_data.hedge_accounts[:]:
-                    is_liquidated, current_size = await self.monitor_position_changes(
-                        hedge_account[0],
-                        pair_data.token
-                    )
-                    if is_liquidated:
-                        if await self.handle_hedge_liquidation(pair_data, hedge_account):
-                            state = self.PAIR_STATE_CLOSED
-                            break
-                    elif current_size < pair_data.initial_states["hedge"][hedge_account[0].account_id] * 0.99:
-                        state = self.PAIR_STATE_PARTIAL_LIQUIDATION
-                        partial_liquidation = {
-                            "account_id": hedge_account[0].account_id,
-                            "start_time": time.time(),
-                            "initial_size": pair_data.initial_states["hedge"][hedge_account[0].account_id]
-                        }
-                        break
+            await self._monitor_pair(pair_data, self.PAIR_STATE_ACTIVE, None)
             return True
         except Exception as e:
             await error(f"{log_prefix} | Error in pair trading: {e}")
             if selected_accounts:
                 async with self.accounts_lock:
                     for acc in selected_accounts:
-                        self.accounts.append(acc)
+                        self.accounts.release(acc)
             if 'pair_data' in locals():
                 await self.position_manager.close_all_positions(
                     [pair_data.main_account[0]] + [acc[0] for acc in pair_data.hedge_accounts],
                     log=False
                 )
+                self.journal.remove(pair_data.main_account[0].account_id)
             return False
+        finally:
+            liquidation_scheduler.remove(log_prefix)
+
+    async def _read_leg(self, account: Backpack, token: str, versions: dict[str, int]) -> Position | None:
+        position = await self.get_position(account, token)
+        versions[account.api_key] = account_streams.get(account).version
+        return position
+
+    async def _monitor_pair(self, pair_data: PairData, state: str, partial_liquidation: dict | None):
+        log_prefix = pair_data.log_prefix
+        versions: dict[str, int] = {}
+        while state != self.PAIR_STATE_CLOSED:
+            self._journal_pair(pair_data, state, partial_liquidation)
+            await liquidation_scheduler.wait(
+                log_prefix,
+                [pair_data.main_account[0]] + [acc[0] for acc in pair_data.hedge_accounts],
+                DELTA_NEUTRAL_SETTINGS['poll_interval'],
+                versions
+            )
+
+            if state == self.PAIR_STATE_PARTIAL_LIQUIDATION:
+                versions = {}
+                if await self._handle_partial_liquidation(pair_data, partial_liquidation):
+                    break
+                continue
+
+            hedge_accounts = pair_data.hedge_accounts[:]
+            versions = {}
+            main_position, *hedge_positions = await asyncio.gather(*[
+                self._read_leg(account[0], pair_data.token, versions)
+                for account in [pair_data.main_account] + hedge_accounts
+            ])
+
+            current_size = abs(main_position.net_exposure_notional) if main_position else 0
+            if current_size == 0:
+                await self.handle_main_liquidation(pair_data)
+                break
+            elif current_size < pair_data.initial_states["main"] * 0.99:
+                state = self.PAIR_STATE_PARTIAL_LIQUIDATION
+                partial_liquidation = {
+                    "account_id": pair_data.main_account[0].account_id,
+                    "start_time": time.time(),
+                    "initial_size": pair_data.initial_states["main"]
+                }
+                liquidation_scheduler.update(log_prefix, [], weight=len(hedge_accounts) + 1, urgent=True)
+                continue
+
+            for hedge_account, hedge_position in zip(hedge_accounts, hedge_positions):
+                current_size = abs(hedge_position.net_exposure_notional) if hedge_position else 0
+                if current_size == 0:
+                    if await self.handle_hedge_liquidation(pair_data, hedge_account):
+                        state = self.PAIR_STATE_CLOSED
+                        break
+                elif current_size < pair_data.initial_states["hedge"][hedge_account[0].account_id] * 0.99:
+                    state = self.PAIR_STATE_PARTIAL_LIQUIDATION
+                    partial_liquidation = {
+                        "account_id": hedge_account[0].account_id,
+                        "start_time": time.time(),
+                        "initial_size": pair_data.initial_states["hedge"][hedge_account[0].account_id]
+                    }
+                    break
+
+            liquidation_scheduler.update(
+                log_prefix,
+                [main_position] + hedge_positions,
+                weight=len(hedge_accounts) + 1,
+                urgent=state == self.PAIR_STATE_PARTIAL_LIQUIDATION
+            )
+        self.journal.remove(pair_data.main_account[0].account_id)
 
     async def start_liquidation_trading(self):
         try:
-            self.futures_decimals = await self.accounts[0][0].get_token_decimals()
-            self.position_manager.futures_decimals = self.futures_decimals
-            await self.get_all_deposit_addresses(self.accounts)
+            await market_registry.load(self.accounts.all()[0][0])
+            await self.get_all_deposit_addresses(self.accounts.all())
+            await self.track_account_limits([acc[0] for acc in self.accounts.all()], self.accounts.subs)
+            restored = await self._restore_pairs()
 
             while True:
                 num_parallel_pairs = random.randint(*DELTA_NEUTRAL_SETTINGS.get('parallel_pairs', [1, 1]))
                 await info(f"Backpack | Starting {num_parallel_pairs} parallel delta neutral pairs")
-                tasks = []
-                for i in range(num_parallel_pairs):
+                tasks = [
+                    asyncio.create_task(self.run_single_pair(pair_data.log_prefix, resume=(pair_data, record)))
+                    for pair_data, record in restored
+                ]
+                for i in range(max(num_parallel_pairs - len(restored), 0)):
                     log_prefix = f"Thread-{i+1}"
                     task = asyncio.create_task(self.run_single_pair(log_prefix))
                     tasks.append(task)
+                restored = []
                 results = await asyncio.gather(*tasks, return_exceptions=True)
                 if not any(results) or not self.accounts:
                     await info("No more accounts available for trading")
@@ -288,7 +372,9 @@ class DeltaNeutralLiquidation(BackpackUtils):
                 await asyncio.sleep(60)
         except Exception as e:
             await error(f"Error in liquidation trading: {e}")
-            await self.position_manager.close_all_positions(
-                [acc[0] for acc in self.accounts]
+            await self.position_manager.flatten_all(
+                [acc[0] for acc in self.accounts.all()],
+                reason=f"critical error: {e}"
             )
+            self.journal.clear()
 
@@ -0,0 +1,75 @@
+import math
+
+from modules.core.backpack import Backpack
+from modules.core.models import Position
+from modules.core.market_data import market_data
+from modules.core.account_stream import account_streams
+from settings import LIQUIDATION_POLLING
+
+
+class LiquidationScheduler:
+    FAST_LANE = "fast"
+    SLOW_LANE = "slow"
+    LIQUIDATION_DISTANCE_NEAR = 0.002
+    LIQUIDATION_DISTANCE_SAFE = 0.01
+
+    def __init__(self):
+        self.watchers: dict[str, tuple[float, int]] = {}
+
+    @staticmethod
+    def get_distance(position: Position) -> float:
+        if not position.est_liquidation_price:
+            return math.inf
+        mark_price = market_data.mark_prices.get(position.symbol) or position.mark_price
+        if not mark_price:
+            return math.inf
+        return abs(mark_price - position.est_liquidation_price) / mark_price
+
+    def update(self, key: str, positions: list[Position | None], weight: int = 1, urgent: bool = False) -> float:
+        distance = 0 if urgent else min(
+            (self.get_distance(position) for position in positions if position),
+            default=math.inf
+        )
+        self.watchers[key] = (distance, weight)
+        return distance
+
+    def remove(self, key: str):
+        self.watchers.pop(key, None)
+
+    def get_lane(self, key: str) -> str:
+        distance, _ = self.watchers.get(key, (math.inf, 1))
+        return self.FAST_LANE if distance <= LIQUIDATION_POLLING["fast_lane_distance"] else self.SLOW_LANE
+
+    def get_interval(self, key: str, bounds: list[float]) -> float:
+        min_interval, max_interval = bounds
+        distance, _ = self.watchers.get(key, (math.inf, 1))
+        ratio = (distance - self.LIQUIDATION_DISTANCE_NEAR) / (self.LIQUIDATION_DISTANCE_SAFE - self.LIQUIDATION_DISTANCE_NEAR)
+        interval = min_interval + (max_interval - min_interval) * min(max(ratio, 0), 1)
+
+        fast_weight = slow_weight = 0
+        for watcher_key, (_, weight) in self.watchers.items():
+            if self.get_lane(watcher_key) == self.FAST_LANE:
+                fast_weight += weight
+            else:
+                slow_weight += weight
+
+        share = LIQUIDATION_POLLING["fast_lane_share"] if fast_weight and slow_weight else 1
+        if self.get_lane(key) == self.FAST_LANE:
+            lane_weight, lane_share = fast_weight, share
+        else:
+            lane_weight, lane_share = slow_weight, share if share == 1 else 1 - share
+
+        budget_interval = max(lane_weight, 1) / (LIQUIDATION_POLLING["requests_per_second"] * lane_share)
+        return min(max(interval, budget_interval), max_interval)
+
+    async def wait(
+            self,
+            key: str,
+            accounts: list[Backpack],
+            bounds: list[float],
+            versions: dict[str, int] | None = None,
+    ) -> bool:
+        return await account_streams.wait_for_any(accounts, self.get_interval(key, bounds), versions)
+
+
+liquidation_scheduler = LiquidationScheduler()
@@ -0,0 +1,101 @@
+import asyncio
+from time import monotonic
+
+from modules.core.backpack import Backpack
+from modules.core.account_snapshot import AccountSnapshot
+from modules.core.account_stream import account_streams
+from modules.core.market_registry import market_registry
+from modules.core.models import Market
+from modules.helpers.logger import debug
+from modules.helpers.utils import round_to_decimals
+
+
+class MarginEngine:
+    CROSS_CHECK_INTERVAL = 60 * 5
+    SAFETY_FACTOR = 0.98
+    TOLERANCE = 0.05
+
+    def __init__(self):
+        self._last_check: dict[tuple[str, str], float] = {}
+
+    @staticmethod
+    def max_order_quantity(
+            snapshot: AccountSnapshot,
+            market: Market,
+            leverage: int,
+            price: float,
+            side: str,
+            net_quantity: float = 0,
+    ) -> float:
+        if market.max_leverage:
+            leverage = min(leverage, market.max_leverage)
+        quantity = max(snapshot.net_equity_available, 0) * MarginEngine.SAFETY_FACTOR * leverage / price
+        if (side == "Bid" and net_quantity < 0) or (side == "Ask" and net_quantity > 0):
+            quantity += abs(net_quantity)
+        return round_to_decimals(quantity, market.amount_decimals)
+
+    @staticmethod
+    def withdrawable(snapshot: AccountSnapshot, symbol: str = "USDC") -> float:
+        available = min(snapshot.available.get(symbol, 0), snapshot.net_equity_available)
+        return max(available * MarginEngine.SAFETY_FACTOR, 0)
+
+    def _needs_cross_check(self, account: Backpack, kind: str) -> bool:
+        key = (account.api_key, kind)
+        now = monotonic()
+        if now - self._last_check.get(key, float("-inf")) < self.CROSS_CHECK_INTERVAL:
+            return False
+        self._last_check[key] = now
+        return True
+
+    async def _cross_check(self, account: Backpack, name: str, local: float, server: float):
+        if abs(local - server) > max(abs(server), 1e-9) * self.TOLERANCE:
+            await debug(f"Margin | Local {name} {local:.8f} differs from server {server:.8f} on {account.account_id}", telegram=False)
+
+    async def _net_quantity(self, account: Backpack, symbol: str) -> float:
+        stream = account_streams.get(account)
+        if stream.connected:
+            positions = stream.positions.values()
+        else:
+            positions = await stream.get_positions()
+        for position in positions:
+            if position.symbol == symbol:
+                return position.net_quantity
+        return 0
+
+    async def get_max_order_quantity(self, account: Backpack, token: str, side: str, price: float) -> float:
+        market = market_registry.get(token)
+        requests = [
+            account.get_snapshot(max_age=account.SNAPSHOT_MAX_AGE, balances=False),
+            account.get_leverage(),
+            self._net_quantity(account, market.symbol),
+        ]
+        if self._needs_cross_check(account, "order"):
+            requests.append(account.get_max_order_size(market.symbol, side))
+
+        snapshot, leverage, net_quantity, *server = await asyncio.gather(*requests)
+        local = self.max_order_quantity(snapshot, market, leverage, price, side, net_quantity)
+        if not server:
+            return local
+        server = server[0]
+
+        await self._cross_check(account, f"max {side} size for {market.symbol}", local, server)
+        return min(local, server)
+
+    async def get_withdrawable(self, account: Backpack, symbol: str = "USDC", verify: bool = False) -> float:
+        if verify or self._needs_cross_check(account, "withdrawal"):
+            server = await account.get_transferable_amount(symbol)
+            if verify:
+                return server
+        else:
+            server = None
+
+        snapshot = await account.get_snapshot(max_age=account.SNAPSHOT_MAX_AGE, balances=False)
+        local = self.withdrawable(snapshot, symbol)
+        if server is None:
+            return local
+
+        await self._cross_check(account, f"withdrawable {symbol}", local, server)
+        return min(local, server)
+
+
+margin_engine = MarginEngine()
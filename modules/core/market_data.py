@@ -0,0 +1,123 @@
+import asyncio
+from time import monotonic
+
+import aiohttp
+
+from modules.core.backpack import Backpack
+from modules.core.models import Ticker
+from modules.helpers.logger import debug, warning
+from modules.helpers.utils import request_proxy_format
+from modules.data.constants import BACKPACK_WS_URL
+
+
+class MarketDataService:
+    WS_URL = BACKPACK_WS_URL
+    STALE_AFTER = 15
+    REST_INTERVAL = 5
+    RECONNECT_DELAY = [1, 60]
+
+    def __init__(self):
+        self.last_prices: dict[str, float] = {}
+        self.mark_prices: dict[str, float] = {}
+        self.connected = False
+        self.last_message = 0.0
+        self.last_rest_update = 0.0
+        self._task: asyncio.Task | None = None
+        self._rest_lock = asyncio.Lock()
+
+    def start(self, account: Backpack):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(account))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.connected = False
+
+    def is_fresh(self) -> bool:
+        return self.connected and monotonic() - self.last_message < self.STALE_AFTER
+
+    async def get_prices(self, account: Backpack, futures_only=False) -> dict[str, float]:
+        self.start(account)
+        if not self.last_prices or not self.is_fresh():
+            await self._refresh_from_rest(account)
+
+        prices = {
+            symbol.replace("_USDC", "").replace("_PERP", ""): price
+            for symbol, price in self.last_prices.items()
+            if symbol.endswith("_PERP")
+        }
+        if not futures_only:
+            prices.update({
+                symbol.replace("_USDC", ""): price
+                for symbol, price in self.last_prices.items()
+                if not symbol.endswith("_PERP")
+            })
+        prices["USDC"] = 1
+        return prices
+
+    async def _refresh_from_rest(self, account: Backpack):
+        async with self._rest_lock:
+            if self.last_prices and monotonic() - self.last_rest_update < self.REST_INTERVAL:
+                return
+            self._update_from_tickers(await account.get_tickers())
+
+    def _update_from_tickers(self, tickers: list[Ticker]):
+        for ticker in tickers:
+            self.last_prices[ticker.symbol] = ticker.last_price
+        self.last_rest_update = monotonic()
+
+    def _on_message(self, message: dict):
+        data = message.get("data") or {}
+        event = data.get("e")
+        if event == "ticker":
+            self.last_prices[data["s"]] = float(data["c"])
+        elif event == "markPrice":
+            self.mark_prices[data["s"]] = float(data["p"])
+        self.last_message = monotonic()
+
+    async def _run(self, account: Backpack):
+        delay = self.RECONNECT_DELAY[0]
+        req_proxy = request_proxy_format(account.proxy)
+        proxy = req_proxy["https"] if req_proxy else None
+
+        while True:
+            try:
+                async with self._rest_lock:
+                    self._update_from_tickers(await account.get_tickers())
+                symbols = list(self.last_prices)
+                streams = [f"ticker.{symbol}" for symbol in symbols] + [
+                    f"markPrice.{symbol}" for symbol in symbols if symbol.endswith("_PERP")
+                ]
+
+                async with aiohttp.ClientSession() as session:
+                    async with session.ws_connect(self.WS_URL, proxy=proxy, heartbeat=30) as ws:
+                        await ws.send_json({"method": "SUBSCRIBE", "params": streams})
+                        self.connected = True
+                        self.last_message = monotonic()
+                        delay = self.RECONNECT_DELAY[0]
+                        await debug(f"Market Data | Subscribed to {len(streams)} price streams", telegram=False)
+
+                        async for msg in ws:
+                            if msg.type != aiohttp.WSMsgType.TEXT:
+                                break
+                            self._on_message(msg.json())
+
+                raise Exception("stream closed by server")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.connected = False
+                await warning(f"Market Data | Price stream dropped: {e}. Using REST prices, reconnecting in {delay}s", telegram=False)
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.RECONNECT_DELAY[1])
+
+
+market_data = MarketDataService()
@@ -0,0 +1,94 @@
+import os
+import json
+import asyncio
+from dataclasses import asdict
+from time import time
+
+from modules.core.backpack import Backpack
+from modules.core.models import Market
+from modules.helpers.logger import debug, warning
+
+
+class MarketRegistry:
+    PATH = "database/markets.json"
+    TTL = 60 * 60 * 6
+
+    def __init__(self, path: str = PATH):
+        self.path = path
+        self.markets: dict[str, Market] = {}
+        self.updated = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+        self._account: Backpack | None = None
+        self._read()
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.markets = {base: Market(**market) for base, market in data["markets"].items()}
+            self.updated = data["updated"]
+        except (ValueError, KeyError, TypeError):
+            self.markets = {}
+            self.updated = 0.0
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump({
+                "updated": self.updated,
+                "markets": {base: asdict(market) for base, market in self.markets.items()}
+            }, f, indent=4)
+
+    def is_expired(self) -> bool:
+        return time() - self.updated > self.TTL
+
+    async def refresh(self, account: Backpack, if_expired: bool = False):
+        async with self._lock:
+            if if_expired and self.markets and not self.is_expired():
+                return
+
+            markets = {}
+            for market in await account.get_markets():
+                if market["symbol"].endswith("_PERP"):
+                    markets[market["baseSymbol"]] = Market.from_api(market)
+
+            self.markets = markets
+            self.updated = time()
+            self._write()
+            await debug(f"Markets | Loaded {len(markets)} perp markets", telegram=False)
+
+    async def _refresh_in_background(self, account: Backpack):
+        try:
+            await self.refresh(account, if_expired=True)
+        except Exception as e:
+            await warning(f"Markets | Background refresh failed, using cached markets: {e}", telegram=False)
+
+    def _schedule_refresh(self):
+        if self._account is not None and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._refresh_in_background(self._account))
+
+    async def load(self, account: Backpack):
+        self._account = account
+        if not self.markets:
+            await self.refresh(account, if_expired=True)
+        elif self.is_expired():
+            self._schedule_refresh()
+
+    def get(self, token: str) -> Market:
+        if self.is_expired():
+            self._schedule_refresh()
+        market = self.markets.get(token)
+        if market is None:
+            raise Exception(f"Unknown market {token}_USDC_PERP")
+        return market
+
+    def validate_order(self, token: str, quantity: float):
+        market = self.get(token)
+        if quantity < float(market.min_quantity):
+            raise Exception(f"Order quantity {quantity} {token} is below minimum {market.min_quantity}")
+
+
+market_registry = MarketRegistry()
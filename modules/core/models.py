@@ -0,0 +1,187 @@
+from sys import intern
+from dataclasses import dataclass, replace
+from typing import ClassVar
+
+
+def symbol_token(symbol: str) -> str:
+    return intern(symbol.split("_")[0])
+
+
+@dataclass(slots=True)
+class Position:
+    symbol: str
+    token: str
+    net_quantity: float = 0
+    net_exposure_quantity: float = 0
+    net_exposure_notional: float = 0
+    entry_price: float = 0
+    break_even_price: float = 0
+    mark_price: float = 0
+    est_liquidation_price: float = 0
+    pnl_realized: float = 0
+    pnl_unrealized: float = 0
+    imf: float = 0
+    mmf: float = 0
+    position_id: str = ""
+
+    API_FIELDS: ClassVar[dict[str, str]] = {
+        "netQuantity": "net_quantity",
+        "netExposureQuantity": "net_exposure_quantity",
+        "netExposureNotional": "net_exposure_notional",
+        "entryPrice": "entry_price",
+        "breakEvenPrice": "break_even_price",
+        "markPrice": "mark_price",
+        "estLiquidationPrice": "est_liquidation_price",
+        "pnlRealized": "pnl_realized",
+        "pnlUnrealized": "pnl_unrealized",
+        "imf": "imf",
+        "mmf": "mmf",
+    }
+    WS_FIELDS: ClassVar[dict[str, str]] = {
+        "q": "net_quantity",
+        "Q": "net_exposure_quantity",
+        "n": "net_exposure_notional",
+        "B": "entry_price",
+        "b": "break_even_price",
+        "M": "mark_price",
+        "l": "est_liquidation_price",
+        "p": "pnl_realized",
+        "P": "pnl_unrealized",
+        "f": "imf",
+        "m": "mmf",
+    }
+
+    @classmethod
+    def from_api(cls, data: dict):
+        position = cls(symbol=intern(data["symbol"]), token=symbol_token(data["symbol"]))
+        position.update(data, cls.API_FIELDS)
+        position.position_id = str(data.get("positionId", ""))
+        return position
+
+    @classmethod
+    def from_ws(cls, data: dict):
+        position = cls(symbol=intern(data["s"]), token=symbol_token(data["s"]))
+        position.update(data, cls.WS_FIELDS)
+        return position
+
+    def update(self, data: dict, fields: dict[str, str]):
+        for key, field in fields.items():
+            value = data.get(key)
+            if value is not None:
+                setattr(self, field, float(value))
+        if "i" in data and fields is self.WS_FIELDS:
+            self.position_id = str(data["i"])
+
+    def copy(self):
+        return replace(self)
+
+
+@dataclass(slots=True)
+class PositionEvent:
+    OPENED: ClassVar[str] = "opened"
+    CLOSED: ClassVar[str] = "closed"
+    RESIZED: ClassVar[str] = "resized"
+    PNL_CHANGED: ClassVar[str] = "pnl_changed"
+
+    kind: str
+    symbol: str
+    token: str
+    position: Position | None
+    previous: Position | None
+
+    @classmethod
+    def diff(cls, previous: Position | None, current: Position | None):
+        if previous is None and current is None:
+            return None
+        if previous is None:
+            kind = cls.OPENED
+        elif current is None:
+            kind = cls.CLOSED
+        elif current.net_quantity != previous.net_quantity:
+            kind = cls.RESIZED
+        elif current.pnl_unrealized != previous.pnl_unrealized or current.pnl_realized != previous.pnl_realized:
+            kind = cls.PNL_CHANGED
+        else:
+            return None
+        position = current or previous
+        return cls(kind=kind, symbol=position.symbol, token=position.token, position=current, previous=previous)
+
+
+@dataclass(slots=True)
+class Fill:
+    symbol: str
+    token: str
+    side: str
+    price: float
+    quantity: float
+    fee: float
+    order_id: str
+    trade_id: str
+    timestamp: int
+
+    @classmethod
+    def from_ws(cls, data: dict):
+        return cls(
+            symbol=intern(data["s"]),
+            token=symbol_token(data["s"]),
+            side=intern(data["S"]),
+            price=float(data.get("L") or 0),
+            quantity=float(data.get("l") or 0),
+            fee=float(data.get("n") or 0),
+            order_id=str(data.get("i", "")),
+            trade_id=str(data.get("t", "")),
+            timestamp=int(data.get("T") or 0),
+        )
+
+
+@dataclass(slots=True)
+class Ticker:
+    symbol: str
+    token: str
+    last_price: float
+    is_perp: bool
+
+    @classmethod
+    def from_api(cls, data: dict):
+        return cls(
+            symbol=intern(data["symbol"]),
+            token=symbol_token(data["symbol"]),
+            last_price=float(data["lastPrice"]),
+            is_perp=data["symbol"].endswith("_PERP"),
+        )
+
+
+@dataclass(slots=True)
+class Market:
+    symbol: str
+    base: str
+    quantity_step: str
+    min_quantity: str
+    tick_size: str
+    max_leverage: int
+    amount_decimals: int
+    price_decimals: int
+    tick_size_decimals: int
+
+    @classmethod
+    def from_api(cls, market: dict):
+        filters = market["filters"]
+        min_quantity = filters["quantity"]["minQuantity"]
+        min_price = filters["price"]["minPrice"]
+        tick_size = filters["price"].get("tickSize", "0")
+
+        max_leverage = filters.get("leverage", {}).get("maxLeverage")
+        if not max_leverage and (market.get("imfFunction") or {}).get("base"):
+            max_leverage = 1 / float(market["imfFunction"]["base"])
+
+        return cls(
+            symbol=intern(market["symbol"]),
+            base=intern(market["baseSymbol"]),
+            quantity_step=filters["quantity"].get("stepSize", min_quantity),
+            min_quantity=min_quantity,
+            tick_size=tick_size,
+            max_leverage=int(float(max_leverage)) if max_leverage else 0,
+            amount_decimals=len(min_quantity.split('.')[1]) if '.' in min_quantity else 0,
+            price_decimals=len(min_price.split('.')[1]) if '.' in min_price else 0,
+            tick_size_decimals=len(tick_size.split('.')[1]) if '.' in tick_size else 0,
+        )
@@ -2,6 +2,12 @@ import asyncio
 import random
 from typing import List
 from modules.core.backpack import Backpack
+from modules.core.market_data import market_data
+from modules.core.market_registry import market_registry
+from modules.core.models import Position
+from modules.core.margin import margin_engine
+from modules.core.account_stream import account_streams
+from modules.core.account_limits import account_limit_tracker
 from modules.helpers.logger import success, error, info, warning, debug
 from settings import POSITION_SETTINGS, RETRY, ORDERS_TIMEOUT
 from modules.data.constants import TOKEN_LEVERAGE
@@ -10,9 +16,6 @@ from time import time
 
 
 class PositionManager:
-    def __init__(self, futures_decimals: dict = {}):
-        self.futures_decimals = futures_decimals
-
     def get_token_leverage(self, token: str) -> int:
         return TOKEN_LEVERAGE.get(token, TOKEN_LEVERAGE["default"])
 
@@ -27,28 +30,25 @@ class PositionManager:
             retry: int = 0,
             log_error=True,
     ):
-        if leverage:
-            account_info = await account.get_account_info()
-            if account_info.get("leverageLimit") != str(leverage):
-                await account.change_leverage(leverage)
-                await asyncio.sleep(random.uniform(2.5, 7.5))
+        if leverage and await account.ensure_leverage(leverage):
+            await asyncio.sleep(random.uniform(2.5, 7.5))
 
         normalized_side = "LONG" if side == "Bid" else "SHORT"
         payload = {"orderType": "Market"}
 
         trading_pair = f"{token}_USDC_PERP"
-        max_order_size, token_prices = await asyncio.gather(
-            account.get_max_order_size(trading_pair, side),
-            account.get_prices(futures_only=True)
-        )
+        token_prices = await market_data.get_prices(account, futures_only=True)
+        max_order_size = await margin_engine.get_max_order_quantity(account, token, side, token_prices[token])
         max_usdc_amount = max_order_size * token_prices[token]
+        market = market_registry.get(token)
 
         if usdc_amount:
             if usdc_amount > max_usdc_amount:
                 await warning(f"Backpack | Requested amount {usdc_amount:.2f} USDC exceeds max {max_usdc_amount:.2f} USDC for {token} on {account.account_id}")
                 usdc_amount = max_usdc_amount
 
-            rounded_amount = round_to_decimals(usdc_amount, self.futures_decimals[token]["tick_size"])
+            rounded_amount = round_to_decimals(usdc_amount, market.tick_size_decimals)
+            market_registry.validate_order(token, rounded_amount / token_prices[token])
             payload.update({
                 "quoteQuantity": f"{rounded_amount:.8f}",
                 "side": side,
@@ -61,7 +61,8 @@ class PositionManager:
                 await warning(f"Backpack | Requested amount {token_amount:.8f} {token} exceeds max {max_order_size:.8f} {token} on {account.account_id}")
                 token_amount = max_order_size
 
-            rounded_amount = round_to_decimals(token_amount, self.futures_decimals[token]["amount"])
+            rounded_amount = round_to_decimals(token_amount, market.amount_decimals)
+            market_registry.validate_order(token, rounded_amount)
             payload.update({
                 "quantity": f"{rounded_amount:.8f}",
                 "side": side,
@@ -73,11 +74,13 @@ class PositionManager:
             raise Exception("One of usdc_amount or token_amount must be specified")
 
         order_resp = await account.create_order(payload)
+        account_streams.get(account).mark_dirty()
 
         if order_resp.get("status") == "Filled":
             executed_amount = float(order_resp['executedQuantity'])
             executed_usdc = float(order_resp['executedQuoteQuantity'])
-            order_price = round(executed_usdc / executed_amount, self.futures_decimals[token]["price"])
+            order_price = round(executed_usdc / executed_amount, market.price_decimals)
+            account_limit_tracker.record_order(account.account_id, executed_usdc)
 
             leverage_str = '' if not leverage else f' with {leverage}x'
             await success(f"Backpack | Created {normalized_side} order for {account.account_id}{leverage_str}: {executed_amount:.5f} {token} @ {order_price} USDC")
@@ -181,27 +184,27 @@ class PositionManager:
     async def monitor_positions(self, long_account: Backpack, short_accounts: List[Backpack], token: str):
         try:
             trading_pair = f"{token}_USDC_PERP"
+            stream = account_streams.get(long_account)
             start_time = time()
             max_position_time = round(random.uniform(*POSITION_SETTINGS['max_position_time']), 2)
             pnl_limit = round(random.uniform(*POSITION_SETTINGS['max_pnl']), 2)
-            account_leverage = int((await long_account.get_account_info())['leverageLimit'])
+            account_leverage = await long_account.get_leverage()
 
             await info(f"Backpack | Monitoring long position with PnL limit of {pnl_limit} and max position time of {max_position_time} seconds")
 
             while True:
                 elapsed_time = time() - start_time
 
-                positions = await long_account.get_futures_positions()
-                long_position = next((pos for pos in positions if pos.get("symbol") == trading_pair), None)
+                positions = await stream.get_positions()
+                version = stream.version
+                long_position = next((pos for pos in positions if pos.symbol == trading_pair), None)
 
                 if not long_position:
                     await warning(f"Backpack | Long position not found for {trading_pair}")
                     break
 
-                unrealized_pnl = float(long_position["pnlUnrealized"])
-                realized_pnl = float(long_position["pnlRealized"])
-                total_pnl = unrealized_pnl + realized_pnl
-                net_exposure = abs(float(long_position["netExposureNotional"]))
+                total_pnl = long_position.pnl_unrealized + long_position.pnl_realized
+                net_exposure = abs(long_position.net_exposure_notional)
 
                 position_size = net_exposure / account_leverage
                 pnl_percent = total_pnl / position_size * 100
@@ -214,7 +217,7 @@ class PositionManager:
                     await info(f"Backpack | PnL limit reached for {trading_pair}: {pnl_percent:.2f}%. Hold time: {elapsed_time:.2f} seconds")
                     break
 
-                await asyncio.sleep(10)
+                await stream.wait_for_update(10, version)
 
             await self.close_all_positions([long_account] + short_accounts)
 
@@ -222,38 +225,87 @@ class PositionManager:
             await error(f"Backpack | Error monitoring positions: {e}")
             await self.close_all_positions([long_account] + short_accounts, token=token)
 
+    @staticmethod
+    def _close_order(position: Position) -> dict | None:
+        market = market_registry.get(position.token)
+        amount = round_to_decimals(abs(position.net_quantity), market.amount_decimals)
+        if amount == 0:
+            return None
+        return {
+            "symbol": position.symbol,
+            "side": "Bid" if position.net_quantity < 0 else "Ask",
+            "orderType": "Market",
+            "quantity": f"{amount:.8f}",
+            "reduceOnly": True,
+        }
+
+    async def _submit_close_orders(self, account: Backpack, orders: list[dict], positions: dict[str, Position]) -> list[dict]:
+        if len(orders) == 1:
+            results = [await account.create_order(orders[0])]
+        else:
+            results = await account.create_orders(orders)
+        account_streams.get(account).mark_dirty()
+
+        failed = []
+        for order, result in zip(orders, results):
+            token = order["symbol"].replace('_USDC_PERP', '')
+            executed_amount = float(result.get("executedQuantity") or 0)
+            if result.get("status") == "Filled" and executed_amount >= float(order["quantity"]):
+                executed_usdc = float(result["executedQuoteQuantity"])
+                order_price = round(executed_usdc / executed_amount, market_registry.get(token).price_decimals)
+                account_limit_tracker.record_order(account.account_id, executed_usdc)
+                entry_usdc = positions[order["symbol"]].entry_price * executed_amount
+                account_limit_tracker.record_pnl(
+                    account.account_id,
+                    executed_usdc - entry_usdc if order["side"] == "Ask" else entry_usdc - executed_usdc
+                )
+                normalized_side = "LONG" if order["side"] == "Bid" else "SHORT"
+                await success(f"Backpack | Created {normalized_side} order for {account.account_id}: {executed_amount:.5f} {token} @ {order_price} USDC")
+            else:
+                failed.append(order)
+                await warning(f"Backpack | Close order for {order['symbol']} on {account.account_id} not filled: {result.get('message', result)}")
+        return failed
+
+    @staticmethod
+    async def _get_positions(account: Backpack) -> list[Position]:
+        stream = account_streams.get(account)
+        if stream.connected:
+            return await stream.get_positions()
+        return await account.get_futures_positions()
+
     async def close_positions(self, account: Backpack, token: str = None):
         trading_pair = f"{token}_USDC_PERP" if token else None
         try:
-            positions = await account.get_futures_positions()
+            positions = await self._get_positions(account)
             if not positions:
                 await info(f"Backpack | No positions found on {account.account_id}")
                 return 1
 
             if trading_pair:
-                positions = [pos for pos in positions if pos.get("symbol") == trading_pair]
+                positions = [pos for pos in positions if pos.symbol == trading_pair]
 
+            orders = []
             for position in positions:
-                symbol = position["symbol"]
-                token = position["symbol"].replace('_USDC_PERP', '')
-                    
-                side = "Bid" if float(position["netQuantity"]) < 0 else "Ask"
-                position_amount = round_to_decimals(
-                    abs(float(position["netExposureQuantity"])),
-                    self.futures_decimals[token]["amount"]
-                )
-                
-                if position_amount == 0:
-                    await warning(f"Backpack | Zero position amount for {symbol} on {account.account_id}")
+                order = self._close_order(position)
+                if order is None:
+                    await warning(f"Backpack | Zero position amount for {position.symbol} on {account.account_id}")
                     continue
+                orders.append(order)
 
-                await self.create_future_order(
-                    account=account,
-                    token=token,
-                    side=side,
-                    token_amount=position_amount,
-                )
+            if not orders:
+                return True
 
+            failed = await self._submit_close_orders(account, orders, {pos.symbol: pos for pos in positions})
+            for _ in range(RETRY):
+                if not failed:
+                    break
+                positions = {pos.symbol: pos for pos in await account.get_futures_positions()}
+                orders = [self._close_order(positions[order["symbol"]]) for order in failed if order["symbol"] in positions]
+                orders = [order for order in orders if order is not None]
+                failed = await self._submit_close_orders(account, orders, positions) if orders else []
+
+            if failed:
+                raise Exception(f"Positions left open: {', '.join(order['symbol'] for order in failed)}")
             return True
 
         except Exception as e:
@@ -280,3 +332,46 @@ class PositionManager:
         except Exception as e:
             await error(f"Backpack | Error closing all positions: {e}")
             return False
+
+    async def get_residual_exposure(self, accounts: List[Backpack]) -> dict[str, list[Position] | Exception]:
+        results = await asyncio.gather(
+            *[account.get_futures_positions() for account in accounts],
+            return_exceptions=True
+        )
+        residual = {}
+        for account, positions in zip(accounts, results):
+            if isinstance(positions, Exception):
+                residual[account.account_id] = positions
+                continue
+            open_positions = [pos for pos in positions if pos.net_quantity != 0]
+            if open_positions:
+                residual[account.account_id] = open_positions
+        return residual
+
+    async def flatten_all(self, accounts: List[Backpack], reason: str) -> dict[str, list[Position] | Exception]:
+        await warning(f"Backpack | Emergency flatten of {len(accounts)} accounts: {reason}")
+        await asyncio.gather(
+            *[self.close_positions(account) for account in accounts],
+            return_exceptions=True
+        )
+
+        residual = await self.get_residual_exposure(accounts)
+        if not residual:
+            await success(f"Backpack | Emergency flatten complete, no residual exposure on {len(accounts)} accounts")
+            return residual
+
+        total_notional = 0
+        lines = []
+        for account_id, positions in residual.items():
+            if isinstance(positions, Exception):
+                lines.append(f"{account_id}: failed to verify positions: {positions}")
+                continue
+            for position in positions:
+                notional = abs(position.net_exposure_notional)
+                total_notional += notional
+                lines.append(f"{account_id}: {position.symbol} {position.net_quantity} ({notional:.2f} USDC)")
+        await error(
+            f"Backpack | Emergency flatten left residual exposure of {total_notional:.2f} USDC on {len(residual)} accounts:\n" +
+            "\n".join(lines)
+        )
+        return residual
@@ -0,0 +1,150 @@
+import asyncio
+import heapq
+from contextlib import asynccontextmanager
+from itertools import count
+from time import monotonic
+
+from settings import RATE_LIMITS
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+
+    def wait_time(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+
+class RateLimiter:
+    PRIORITIES = {
+        "orderExecute": 0,
+        "accountUpdate": 1,
+        "positionQuery": 1,
+        "collateralQuery": 1,
+        "balanceQuery": 1,
+        "accountQuery": 1,
+        "maxOrderQuantity": 1,
+        "maxWithdrawalQuantity": 1,
+        "borrowLendPositionQuery": 1,
+        "withdraw": 1,
+        "fillHistoryQueryAll": 3,
+        "depositAddressQuery": 3,
+    }
+    DEFAULT_PRIORITY = 2
+
+    def __init__(self, limits: dict = RATE_LIMITS):
+        self.limits = limits
+        self.max_in_flight = limits["max_in_flight"]
+        self.in_flight = 0
+        self._buckets: dict[tuple, TokenBucket] = {}
+        self._waiters: list[tuple] = []
+        self._counter = count()
+        self._timer: asyncio.TimerHandle | None = None
+        self._timer_deadline = 0.0
+
+    def _get_bucket(self, key: tuple) -> TokenBucket | None:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate, capacity = self.limits[key[0]]
+            if not rate:
+                return None
+            bucket = TokenBucket(rate, max(capacity, 1))
+            self._buckets[key] = bucket
+        return bucket
+
+    @asynccontextmanager
+    async def acquire(self, api_key: str | None, proxy: str | None, instruction: str | None):
+        keys = [("proxy", proxy), ("instruction", proxy, instruction)]
+        if api_key:
+            keys.append(("api_key", api_key))
+        priority = self.PRIORITIES.get(instruction, self.DEFAULT_PRIORITY)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), keys, future))
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        now = monotonic()
+        blocked = set()
+        deferred = []
+        next_wakeup = None
+
+        while self._waiters and self.in_flight < self.max_in_flight:
+            waiter = heapq.heappop(self._waiters)
+            keys, future = waiter[2], waiter[3]
+            if future.done():
+                continue
+
+            if blocked.intersection(keys):
+                deferred.append(waiter)
+                continue
+
+            buckets = []
+            wait = 0
+            for key in keys:
+                bucket = self._get_bucket(key)
+                if bucket is None:
+                    continue
+                key_wait = bucket.wait_time(now)
+                if key_wait:
+                    blocked.add(key)
+                    wait = max(wait, key_wait)
+                buckets.append(bucket)
+
+            if wait:
+                deferred.append(waiter)
+                next_wakeup = wait if next_wakeup is None else min(next_wakeup, wait)
+                continue
+
+            for bucket in buckets:
+                bucket.consume()
+            self.in_flight += 1
+            future.set_result(None)
+
+        for waiter in deferred:
+            heapq.heappush(self._waiters, waiter)
+
+        if next_wakeup is not None:
+            self._schedule(now, next_wakeup)
+
+    def _schedule(self, now: float, delay: float):
+        if self._timer is not None:
+            if self._timer_deadline <= now + delay:
+                return
+            self._timer.cancel()
+
+        self._timer_deadline = now + delay
+        self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+
+rate_limiter = RateLimiter()
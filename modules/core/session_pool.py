@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from time import monotonic
+
+from curl_cffi import CurlHttpVersion
+from curl_cffi.requests import AsyncSession
+
+from modules.helpers.utils import request_proxy_format
+
+
+class PooledSession:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.leases = 0
+        self.last_used = monotonic()
+
+
+class SessionPool:
+    MAX_SESSIONS = 64
+    IDLE_TIMEOUT = 300
+    MAX_CLIENTS = 10
+    HEADERS = {
+        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.1.1 Safari/605.1.1",
+        "Origin": "https://backpack.exchange",
+        "Referer": "https://backpack.exchange/",
+    }
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_timeout: float = IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions: OrderedDict[str | None, PooledSession] = OrderedDict()
+
+    def new_session(self, proxy: str | None) -> AsyncSession:
+        session = AsyncSession(
+            impersonate="chrome131",
+            http_version=CurlHttpVersion.V2TLS,
+            max_clients=self.MAX_CLIENTS,
+            headers=self.HEADERS,
+        )
+        req_proxy = request_proxy_format(proxy)
+        if req_proxy:
+            session.proxies.update(req_proxy)
+
+        return session
+
+    @asynccontextmanager
+    async def lease(self, proxy: str | None):
+        entry = self._sessions.get(proxy)
+        if entry is None:
+            entry = PooledSession(self.new_session(proxy))
+            self._sessions[proxy] = entry
+        self._sessions.move_to_end(proxy)
+
+        entry.leases += 1
+        try:
+            yield entry.session
+        finally:
+            entry.leases -= 1
+            entry.last_used = monotonic()
+            await self._evict()
+
+    async def _evict(self):
+        now = monotonic()
+        overflow = len(self._sessions) - self.max_sessions
+        evicted = []
+
+        for proxy, entry in list(self._sessions.items()):
+            if entry.leases:
+                continue
+            if overflow > 0 or now - entry.last_used >= self.idle_timeout:
+                evicted.append(self._sessions.pop(proxy))
+                overflow -= 1
+
+        for entry in evicted:
+            await entry.session.close()
+
+    async def close_all(self):
+        entries = list(self._sessions.values())
+        self._sessions.clear()
+        for entry in entries:
+            await entry.session.close()
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+session_pool = SessionPool()
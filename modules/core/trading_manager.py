@@ -5,7 +5,10 @@ from typing import List
 import random
 
 from modules.core.backpack import Backpack
+from modules.core.account_pool import AccountPool
+from modules.core.account_limits import account_limit_tracker
 from modules.core.position_manager import PositionManager
+from modules.core.market_registry import market_registry
 from modules.core.delta_neutral_liquidation import DeltaNeutralLiquidation
 from modules.core.default_liquidations import DefaultLiquidation
 from modules.core.backpack_utils import BackpackUtils
@@ -24,8 +27,6 @@ class TradingManager(BackpackUtils):
         if not self.accounts:
             sys.exit('No accounts to process')
 
-        self.futures_decimals = {}
-
     def _load_accounts(self, load_sub_accounts: bool = False) -> List[Backpack] | List[List[Backpack]]:
         try:
             with open(self.ACCOUNTS_PATH, "r") as f:
@@ -69,14 +70,13 @@ class TradingManager(BackpackUtils):
             raise Exception(f"Error loading accounts: {e}")
 
     async def start_trading(self):
-        self.futures_decimals = await self.accounts[0].get_token_decimals()
-        self.position_manager.futures_decimals = self.futures_decimals
+        await market_registry.load(self.accounts[0])
         try:
+            await self.track_account_limits(self.accounts)
             while True:
                 await info("Starting new trading cycle...")
 
-                accounts_data = await self.parse_accounts_data(self.accounts)
-                available_accounts = self._filter_available_accounts(accounts_data)
+                available_accounts = await self._filter_available_accounts(self.accounts)
 
                 num_accounts = random.randint(*POSITION_SETTINGS['accounts_in_pair'])
 
@@ -116,19 +116,18 @@ class TradingManager(BackpackUtils):
 
         except Exception as e:
             await error(f"Error in trading cycle: {e}")
-            await self.close_all_positions()
+            await self.emergency_flatten(f"critical error: {e}")
 
-    def _filter_available_accounts(self, accounts_data) -> List[Backpack]:
-        available_accounts = []
+    async def _filter_available_accounts(self, accounts: List[Backpack]) -> List[Backpack]:
+        candidates = []
         minimum_usdc_balance = POSITION_SETTINGS["total_positions_size"][1] / POSITION_SETTINGS["leverage"][0] / 2 * 1.1
+        account_limit_tracker.roll_week()
 
-        for account_data in accounts_data:
-            if not account_data:
+        for backpack in accounts:
+            counters = account_limit_tracker.get(backpack.account_id)
+            if counters is None:
                 continue
 
-            account_id = account_data["account_id"]
-            backpack = next((acc for acc in self.accounts if acc.account_id == account_id), None)
-
             limits = self.account_limits[backpack.api_key]
             volume_limit = limits["volume_limit"]
             pnl_limit = limits["pnl_limit"]
@@ -136,21 +135,26 @@ class TradingManager(BackpackUtils):
             if (
                     (
                         volume_limit != 0 and
-                        account_data["statistics"]["volume"]['week'] >= volume_limit
+                        counters.volume >= volume_limit
                     ) or
                     (
                         pnl_limit != 0 and
-                        account_data["statistics"]["pnl"]['week'] >= pnl_limit
+                        counters.pnl >= pnl_limit
                     )
             ):
                 continue
 
-            if account_data["balances"]["usdc"] < minimum_usdc_balance:
-                continue
-
-            available_accounts.append(backpack)
+            candidates.append(backpack)
 
-        return available_accounts
+        snapshots = await asyncio.gather(
+            *[backpack.get_snapshot(max_age=backpack.SNAPSHOT_MAX_AGE) for backpack in candidates],
+            return_exceptions=True
+        )
+        return [
+            backpack
+            for backpack, snapshot in zip(candidates, snapshots)
+            if not isinstance(snapshot, Exception) and snapshot.total.get("USDC", 0) >= minimum_usdc_balance
+        ]
 
     def _select_random_accounts(self, available_accounts: List[Backpack], num_accounts: int) -> List[Backpack]:
         if len(available_accounts) < num_accounts:
@@ -159,18 +163,22 @@ class TradingManager(BackpackUtils):
         return random.sample(available_accounts, num_accounts)
 
     async def close_all_positions(self):
-        self.futures_decimals = await self.accounts[0].get_token_decimals()
-        self.position_manager.futures_decimals = self.futures_decimals
+        await market_registry.load(self.accounts[0])
         await self.position_manager.close_all_positions(self.accounts)
     
+    async def emergency_flatten(self, reason: str = "manual"):
+        accounts = self._load_accounts()
+        await market_registry.load(accounts[0])
+        return await self.position_manager.flatten_all(accounts, reason)
+
     async def run_delta_neutral_liquidations(self):
-        self.accounts = self._load_accounts(load_sub_accounts=True)
-        delta_neutral_liquidation = DeltaNeutralLiquidation(self.accounts, self.position_manager, self.account_limits)
+        self.account_pool = AccountPool(self._load_accounts(load_sub_accounts=True))
+        delta_neutral_liquidation = DeltaNeutralLiquidation(self.account_pool, self.position_manager, self.account_limits)
         await delta_neutral_liquidation.start_liquidation_trading()
 
     async def run_default_liquidations(self):
-        self.accounts = self._load_accounts(load_sub_accounts=True)
-        default_liquidation = DefaultLiquidation(self.accounts, self.position_manager, self.account_limits)
+        self.account_pool = AccountPool(self._load_accounts(load_sub_accounts=True))
+        default_liquidation = DefaultLiquidation(self.account_pool, self.position_manager, self.account_limits)
         await default_liquidation.start_liquidation_trading()
 
     async def withdraw_all_balances(self):
@@ -1,8 +1,12 @@
+import os
 from questionary import Style
 
 
 QUESTIONARY_STYLE = Style([("highlighted", "fg:#47A6F9")])
 
+BACKPACK_URL = os.getenv("BACKPACK_URL", "https://api.backpack.exchange")
+BACKPACK_WS_URL = os.getenv("BACKPACK_WS_URL", "wss://ws.backpack.exchange")
+
 TOKEN_LEVERAGE = {
     "BTC": 50,
     "SOL": 50,
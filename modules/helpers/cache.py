@@ -0,0 +1,54 @@
+import asyncio
+from functools import wraps
+from time import monotonic
+
+
+class ResponseCache:
+    def __init__(self):
+        self._entries: dict[tuple, tuple[float, object]] = {}
+        self._in_flight: dict[tuple, asyncio.Task] = {}
+
+    async def get_or_fetch(self, key: tuple, ttl: float, fetch):
+        entry = self._entries.get(key)
+        if entry is not None:
+            if monotonic() < entry[0]:
+                return entry[1]
+            del self._entries[key]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(fetch())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, ttl, t))
+
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: tuple, ttl: float, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if ttl > 0:
+            self._entries[key] = (monotonic() + ttl, task.result())
+
+    def invalidate(self, scope: str | None, name: str = None):
+        for key in list(self._entries):
+            if key[1] == scope and (name is None or key[0] == name):
+                del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+
+def cached(ttl: float, shared: bool = False):
+    def decorator(f):
+        @wraps(f)
+        async def newfn(self, *args, **kwargs):
+            scope = None if shared else self.account_id
+            key = (f.__name__, scope, args, tuple(sorted(kwargs.items())))
+            return await response_cache.get_or_fetch(key, ttl, lambda: f(self, *args, **kwargs))
+        return newfn
+    return decorator
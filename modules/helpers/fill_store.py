@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import asyncio
+from datetime import datetime, timezone
+
+
+FILLS = "fills"
+LIQUIDATIONS = "liquidations"
+
+
+def fill_timestamp(timestamp: str) -> float:
+    return datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc).timestamp()
+
+
+class FillStore:
+    DB_PATH = "database/fills.db"
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._db: sqlite3.Connection | None = None
+        self._locks: dict[tuple[str, str], asyncio.Lock] = {}
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS fills (
+                    api_key TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    trade_id TEXT NOT NULL,
+                    order_id TEXT NOT NULL,
+                    symbol TEXT NOT NULL,
+                    side TEXT NOT NULL,
+                    price TEXT NOT NULL,
+                    quantity TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    ts REAL NOT NULL,
+                    PRIMARY KEY (api_key, kind, trade_id, order_id, timestamp, side, quantity)
+                );
+                CREATE INDEX IF NOT EXISTS fills_by_time ON fills (api_key, kind, ts);
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    api_key TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    cursor INTEGER NOT NULL,
+                    PRIMARY KEY (api_key, kind)
+                );
+            """)
+        return self._db
+
+    def lock(self, api_key: str, kind: str) -> asyncio.Lock:
+        key = (api_key, kind)
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    def get_cursor(self, api_key: str, kind: str) -> int | None:
+        row = self.db.execute(
+            "SELECT cursor FROM sync_state WHERE api_key = ? AND kind = ?",
+            (api_key, kind)
+        ).fetchone()
+        return row[0] if row else None
+
+    def add_fills(self, api_key: str, kind: str, fills: list[dict]):
+        if not fills:
+            return
+        rows = [
+            (
+                api_key,
+                kind,
+                str(fill.get("tradeId") or ""),
+                str(fill.get("orderId") or ""),
+                fill["symbol"],
+                fill["side"],
+                fill["price"],
+                fill["quantity"],
+                fill["timestamp"],
+                fill_timestamp(fill["timestamp"]),
+            )
+            for fill in fills
+        ]
+        cursor = int(max(row[-1] for row in rows) * 1000)
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO fills VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.db.execute(
+                "INSERT INTO sync_state VALUES (?, ?, ?) "
+                "ON CONFLICT (api_key, kind) DO UPDATE SET cursor = MAX(cursor, excluded.cursor)",
+                (api_key, kind, cursor)
+            )
+
+    def iter_fills(self, api_key: str, kind: str, since: float = 0, batch_size: int = 1000):
+        rows = self.db.execute(
+            "SELECT symbol, side, price, quantity, order_id, timestamp, ts FROM fills "
+            "WHERE api_key = ? AND kind = ? AND ts >= ? ORDER BY ts DESC, rowid DESC",
+            (api_key, kind, since)
+        )
+        while batch := rows.fetchmany(batch_size):
+            yield from batch
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+fill_store = FillStore()
@@ -0,0 +1,68 @@
+import os
+import json
+from time import time
+
+
+class RunJournal:
+    SAVE = "save"
+    REMOVE = "remove"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._last: dict[str, str] = {}
+
+    def _write(self, entry: dict):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, "a")
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def save(self, key: str, state: dict):
+        encoded = json.dumps(state, sort_keys=True)
+        if self._last.get(key) == encoded:
+            return
+        self._write({"ts": time(), "event": self.SAVE, "key": key, "state": state})
+        self._last[key] = encoded
+
+    def remove(self, key: str):
+        if self._last.pop(key, None) is None:
+            return
+        self._write({"ts": time(), "event": self.REMOVE, "key": key})
+
+    def clear(self):
+        for key in list(self._last):
+            self.remove(key)
+
+    def load(self) -> dict[str, dict]:
+        active = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry["event"] == self.REMOVE:
+                        active.pop(entry["key"], None)
+                    else:
+                        active[entry["key"]] = entry["state"]
+
+        self.close()
+        tmp_path = f"{self.path}.tmp"
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(tmp_path, "w") as f:
+            for key, state in active.items():
+                f.write(json.dumps({"ts": time(), "event": self.SAVE, "key": key, "state": state}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._last = {key: json.dumps(state, sort_keys=True) for key, state in active.items()}
+        return active
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,165 @@
+import os
+import json
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime
+
+from modules.helpers.logger import info
+
+
+class Histogram:
+    BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(self.BUCKETS[i], round(self.max, 4)) if i < len(self.BUCKETS) else round(self.max, 4)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "avg": round(self.total / self.count, 4) if self.count else 0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": round(self.max, 4),
+            "buckets": {
+                **{f"<={bucket}": count for bucket, count in zip(self.BUCKETS, self.counts)},
+                "inf": self.counts[-1],
+            },
+        }
+
+
+class RequestStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses = Counter()
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def merge(self, other: "RequestStats"):
+        self.latency.merge(other.latency)
+        self.statuses.update(other.statuses)
+        self.errors += other.errors
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.latency.count,
+            "errors": self.errors,
+            "statuses": dict(self.statuses),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency": self.latency.to_dict(),
+        }
+
+
+class RequestMetrics:
+    DUMP_PATH = "database/request_metrics.json"
+
+    def __init__(self):
+        self.requests: dict[tuple[str, str, str], RequestStats] = {}
+        self.retries = Counter()
+        self.started = datetime.now()
+
+    @staticmethod
+    def proxy_label(proxy: str | None) -> str:
+        if not proxy:
+            return "direct"
+        return ":".join(proxy.split(":")[:2])
+
+    def record(
+            self,
+            instruction: str,
+            account: str,
+            proxy: str | None,
+            latency: float,
+            status: int | str,
+            bytes_sent: int = 0,
+            bytes_received: int = 0,
+    ):
+        key = (instruction, account, self.proxy_label(proxy))
+        stats = self.requests.get(key)
+        if stats is None:
+            stats = self.requests[key] = RequestStats()
+
+        stats.latency.observe(latency)
+        stats.statuses[str(status)] += 1
+        if not isinstance(status, int) or status >= 400:
+            stats.errors += 1
+        stats.bytes_sent += bytes_sent
+        stats.bytes_received += bytes_received
+
+    def record_retry(self, module_str: str, account: str | None, kind: str):
+        self.retries[(module_str, account or "-", kind)] += 1
+
+    def summary(self) -> dict:
+        by_instruction: dict[str, RequestStats] = {}
+        by_proxy: dict[str, RequestStats] = {}
+        for (instruction, _, proxy), stats in self.requests.items():
+            for group, label in ((by_instruction, instruction), (by_proxy, proxy)):
+                group.setdefault(label, RequestStats()).merge(stats)
+
+        return {
+            "started": self.started.strftime("%Y-%m-%d %H:%M:%S"),
+            "dumped": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "by_instruction": {label: stats.to_dict() for label, stats in by_instruction.items()},
+            "by_proxy": {label: stats.to_dict() for label, stats in by_proxy.items()},
+            "requests": [
+                {"instruction": instruction, "account": account, "proxy": proxy, **stats.to_dict()}
+                for (instruction, account, proxy), stats in self.requests.items()
+            ],
+            "retries": [
+                {"module": module_str, "account": account, "kind": kind, "count": count}
+                for (module_str, account, kind), count in self.retries.items()
+            ],
+        }
+
+    async def dump(self, path: str = DUMP_PATH):
+        summary = self.summary()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(summary, f, indent=4)
+
+        lines = [
+            f"{label}: {stats['count']} req, {stats['errors']} err, "
+            f"p50 {stats['latency']['p50']}s, p99 {stats['latency']['p99']}s, max {stats['latency']['max']}s"
+            for label, stats in sorted(
+                summary["by_instruction"].items(),
+                key=lambda item: item[1]["latency"]["avg"],
+                reverse=True
+            )
+        ]
+        retries = sum(self.retries.values())
+        await info(
+            f"Metrics | Request summary saved to {path}, {retries} retries\n" + "\n".join(lines),
+            telegram=False
+        )
+
+
+request_metrics = RequestMetrics()
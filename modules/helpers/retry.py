@@ -1,7 +1,79 @@
 import time
+import random
 import asyncio
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import wraps
+
 from settings import RETRY
 from modules.helpers.logger import error
+from modules.helpers.metrics import request_metrics
+
+RETRYABLE = "retryable"
+RATE_LIMITED = "rate_limited"
+FATAL = "fatal"
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class ResponseError(Exception):
+    def __init__(self, response, message: str = None):
+        self.status_code = response.status_code
+        self.retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        super().__init__(message or f"Unexpected response <{response.status_code}>: {response.text}")
+
+
+class RetryError(Exception):
+    def __init__(self, message: str, kind: str):
+        self.kind = kind
+        super().__init__(message)
+
+
+def classify_error(e: Exception) -> str:
+    if isinstance(e, RetryError):
+        return FATAL
+    if isinstance(e, ResponseError):
+        if e.status_code == 429:
+            return RATE_LIMITED
+        if e.status_code == 408 or e.status_code >= 500:
+            return RETRYABLE
+        return FATAL
+    return RETRYABLE
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    retries: int = RETRY
+    base_delay: float = 1
+    max_delay: float = 30
+    multiplier: float = 2
+    jitter: float = 0.5
+    attempt_timeout: float | None = None
+    total_budget: float | None = None
+
+    def get_delay(self, attempt: int, e: Exception, kind: str) -> float:
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        if kind == RATE_LIMITED and getattr(e, "retry_after", None) is not None:
+            delay = max(delay, e.retry_after)
+        return delay
+
+
+DEFAULT_POLICY = RetryPolicy()
+POLL_POLICY = RetryPolicy(retries=5, base_delay=0.2, max_delay=5, attempt_timeout=15, total_budget=30)
+ORDER_POLICY = RetryPolicy(base_delay=0.5, max_delay=5)
 
 
 def retry(module_str: str, retries=RETRY):
@@ -22,18 +94,32 @@ def retry(module_str: str, retries=RETRY):
     return decorator
 
 
-def async_retry(module_str: str, retries=RETRY):
+def async_retry(module_str: str, retries=None, policy: RetryPolicy = DEFAULT_POLICY):
+    if retries is not None:
+        policy = replace(policy, retries=retries)
+
     def decorator(f):
+        @wraps(f)
         async def newfn(*args, **kwargs):
+            started = time.monotonic()
             attempt = 0
-            while attempt < retries:
+            while True:
                 try:
+                    if policy.attempt_timeout:
+                        return await asyncio.wait_for(f(*args, **kwargs), policy.attempt_timeout)
                     return await f(*args, **kwargs)
 
                 except Exception as e:
                     attempt += 1
-                    if attempt == retries:
-                        raise Exception(f'{module_str} | {e}')
+                    kind = classify_error(e)
+                    reason = str(e) or e.__class__.__name__
+                    delay = policy.get_delay(attempt, e, kind)
+                    out_of_budget = (
+                        policy.total_budget is not None and
+                        time.monotonic() - started + delay > policy.total_budget
+                    )
+                    if kind == FATAL or attempt >= policy.retries or out_of_budget:
+                        raise RetryError(f'{module_str} | {reason}', kind)
 
                     account_name = None
                     if args and len(args) > 0:
@@ -41,10 +127,11 @@ def async_retry(module_str: str, retries=RETRY):
                         if hasattr(self, 'account_id'):
                             account_name = self.account_id
 
+                    request_metrics.record_retry(module_str, account_name, kind)
                     if account_name:
-                        await error(f'{account_name} | [{attempt}/{retries}] {module_str} | {e}', True)
+                        await error(f'{account_name} | [{attempt}/{policy.retries}] {module_str} | {reason}. Retrying in {delay:.2f}s', True)
                     else:
-                        await error(f'[-] [{attempt}/{retries}] {module_str} | {e}', True)
-                    await asyncio.sleep(30)
+                        await error(f'[-] [{attempt}/{policy.retries}] {module_str} | {reason}. Retrying in {delay:.2f}s', True)
+                    await asyncio.sleep(delay)
         return newfn
     return decorator
@@ -0,0 +1,58 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class WindowStats:
+    start: float
+    pnl: float = 0
+    volume: float = 0
+    days: set = field(default_factory=set)
+    orders: set = field(default_factory=set)
+    liquidations: int = 0
+
+
+class StatisticsAggregator:
+    def __init__(self, last_reset_timestamp: float, month_timestamp: float):
+        self.windows = {
+            "week": WindowStats(last_reset_timestamp),
+            "month": WindowStats(month_timestamp),
+        }
+        self._unpaired: dict[tuple[str, str], tuple[str, float]] = {}
+
+    def add_fill(self, symbol: str, side: str, price: str, quantity: str, order_id: str, timestamp: str, ts: float):
+        volume = float(price) * float(quantity)
+
+        key = (symbol, quantity)
+        open_fill = self._unpaired.pop(key, None)
+        if open_fill is None:
+            self._unpaired[key] = (side, volume)
+            pnl = None
+        else:
+            open_side, open_volume = open_fill
+            if open_side == side:
+                pnl = None
+            else:
+                pnl = volume - open_volume if open_side == "Bid" else open_volume - volume
+
+        for window in self.windows.values():
+            if ts < window.start:
+                continue
+            window.volume += volume
+            window.days.add(timestamp[:10])
+            window.orders.add(order_id)
+            if pnl is not None:
+                window.pnl += pnl
+
+    def add_liquidation(self, ts: float):
+        for window in self.windows.values():
+            if ts >= window.start:
+                window.liquidations += 1
+
+    def result(self) -> dict:
+        return {
+            "pnl": {name: round(window.pnl, 6) for name, window in self.windows.items()},
+            "volume": {name: round(window.volume, 2) for name, window in self.windows.items()},
+            "active_days": {name: len(window.days) for name, window in self.windows.items()},
+            "orders": {name: len(window.orders) for name, window in self.windows.items()},
+            "liquidations": {name: window.liquidations for name, window in self.windows.items()},
+        }
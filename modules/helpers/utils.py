@@ -31,6 +31,7 @@ def choose_mode() -> str:
             Choice(f"📊️ Run Delta Neutral Liquidations", 'delta_neutral_liquidations'),
             Choice(f"🎰 Run Default Liquidations", 'default_liquidations'),
             Choice(f"🧨 Close All Positions", 'close_positions'),
+            Choice(f"🚨 Emergency Flatten All Positions", 'emergency_flatten'),
             Choice(f"📔 Parse Accounts Data", "parse_accounts_data"),
             Choice(f"💸 Withdraw All Balances on Main Accounts", "withdraw_all_balances"),
             Choice(f"❌ Exit", 'exit'),
@@ -0,0 +1,308 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import resource
+import subprocess
+import tempfile
+from datetime import datetime
+from statistics import mean
+
+import aiohttp
+
+from modules.mock.exchange import generate_accounts
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MODES = ["futures_trading", "delta_neutral_liquidations", "default_liquidations"]
+REPORTS_PATH = "database/benchmarks"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_PATH, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def summarize(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0, "avg": 0, "p50": 0, "p99": 0, "max": 0}
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "avg": round(mean(values), 4),
+        "p50": round(values[len(values) // 2], 4),
+        "p99": round(values[min(int(len(values) * 0.99), len(values) - 1)], 4),
+        "max": round(values[-1], 4),
+    }
+
+
+async def run_scenario(mode: str, accounts_count: int, duration: float, time_scale: float, mock_url: str) -> dict:
+    original_sleep = asyncio.sleep
+
+    async def scaled_sleep(delay, result=None):
+        return await original_sleep(delay * time_scale, result)
+
+    asyncio.sleep = scaled_sleep
+
+    from settings import DELTA_NEUTRAL_SETTINGS, DEFAULT_LIQUIDATION_SETTINGS
+    from modules.core.trading_manager import TradingManager
+    from modules.core.position_manager import PositionManager
+    from modules.core.delta_neutral_liquidation import DeltaNeutralLiquidation
+    from modules.core.default_liquidations import DefaultLiquidation
+    from modules.core.session_pool import session_pool
+    from modules.core.market_data import market_data
+    from modules.core.account_stream import account_streams
+    from modules.helpers.metrics import request_metrics
+
+    pairs = max(accounts_count // max(DELTA_NEUTRAL_SETTINGS["accounts_in_pair"]), 1)
+    DELTA_NEUTRAL_SETTINGS["parallel_pairs"] = [pairs, pairs]
+    DEFAULT_LIQUIDATION_SETTINGS["number_of_parallel_accounts"] = [accounts_count, accounts_count]
+
+    cycles = 0
+    detections = []
+
+    def count_cycles(f):
+        async def wrapper(*args, **kwargs):
+            nonlocal cycles
+            cycles += 1
+            return await f(*args, **kwargs)
+        return wrapper
+
+    def record_detection(f, get_accounts):
+        async def wrapper(self, data, *args, **kwargs):
+            for api_key, token in get_accounts(data, *args):
+                detections.append({"time": time.time(), "api_key": api_key, "symbol": f"{token}_USDC_PERP"})
+            return await f(self, data, *args, **kwargs)
+        return wrapper
+
+    PositionManager.open_positions = count_cycles(PositionManager.open_positions)
+    DeltaNeutralLiquidation.run_single_pair = count_cycles(DeltaNeutralLiquidation.run_single_pair)
+    DefaultLiquidation.manage_account = count_cycles(DefaultLiquidation.manage_account)
+    DefaultLiquidation._handle_liquidation = record_detection(
+        DefaultLiquidation._handle_liquidation,
+        lambda account_data, token, *_: [(account_data.account[0].api_key, token)]
+    )
+    DeltaNeutralLiquidation.handle_main_liquidation = record_detection(
+        DeltaNeutralLiquidation.handle_main_liquidation,
+        lambda pair_data: [(pair_data.main_account[0].api_key, pair_data.token)]
+    )
+    DeltaNeutralLiquidation.handle_hedge_liquidation = record_detection(
+        DeltaNeutralLiquidation.handle_hedge_liquidation,
+        lambda pair_data, account: [(account[0].api_key, pair_data.token)]
+    )
+
+    loop_lags = []
+
+    async def monitor_loop_lag():
+        while True:
+            started = time.perf_counter()
+            await original_sleep(0.1)
+            loop_lags.append(max(time.perf_counter() - started - 0.1, 0))
+
+    async def run_mode():
+        manager = TradingManager()
+        try:
+            if mode == "futures_trading":
+                await manager.start_trading()
+            elif mode == "delta_neutral_liquidations":
+                await manager.run_delta_neutral_liquidations()
+            elif mode == "default_liquidations":
+                await manager.run_default_liquidations()
+        except SystemExit:
+            pass
+
+    lag_task = asyncio.create_task(monitor_loop_lag())
+    started = time.time()
+    mode_task = asyncio.create_task(run_mode())
+    done, _ = await asyncio.wait([mode_task], timeout=duration)
+    if not done:
+        mode_task.cancel()
+        await asyncio.wait([mode_task], timeout=60)
+    elapsed = time.time() - started
+    lag_task.cancel()
+
+    await account_streams.stop_all()
+    await market_data.stop()
+    await session_pool.close_all()
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{mock_url}/mock/state") as response:
+            state = await response.json()
+
+    latencies = []
+    matched = set()
+    for detection in detections:
+        candidates = [
+            (i, liquidation) for i, liquidation in enumerate(state["liquidations"])
+            if i not in matched and
+            liquidation["api_key"] == detection["api_key"] and
+            liquidation["symbol"] == detection["symbol"] and
+            liquidation["time"] <= detection["time"]
+        ]
+        if candidates:
+            i, liquidation = candidates[-1]
+            matched.add(i)
+            latencies.append(detection["time"] - liquidation["time"])
+
+    summary = request_metrics.summary()
+    calls = {label: stats["count"] for label, stats in summary["by_instruction"].items()}
+    total_calls = sum(calls.values())
+    orders = summary["by_instruction"].get("orderExecute", {}).get("statuses", {}).get("200", 0)
+
+    return {
+        "mode": mode,
+        "accounts": accounts_count,
+        "duration": round(elapsed, 2),
+        "time_scale": time_scale,
+        "cycles": cycles,
+        "api_calls": total_calls,
+        "api_calls_per_cycle": round(total_calls / cycles, 2) if cycles else None,
+        "api_calls_per_minute": round(total_calls / elapsed * 60, 2),
+        "api_calls_by_instruction": calls,
+        "errors": sum(stats["errors"] for stats in summary["by_instruction"].values()),
+        "retries": sum(item["count"] for item in summary["retries"]),
+        "orders": orders,
+        "orders_per_minute": round(orders / elapsed * 60, 2),
+        "liquidations": len(state["liquidations"]),
+        "liquidations_detected": len(latencies),
+        "detection_latency": summarize(latencies),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        "loop_lag": summarize(loop_lags),
+    }
+
+
+def run_child(args):
+    result = asyncio.run(run_scenario(args.mode, args.accounts[0], args.duration, args.time_scale, args.mock_url))
+    with open(args.result, "w") as f:
+        json.dump(result, f)
+
+
+def run_benchmarks(args) -> dict:
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().strftime("%Y-%m-%d_%H-%M-%S"),
+        "python": sys.version.split()[0],
+        "scenarios": [],
+    }
+
+    for mode in args.modes:
+        for accounts_count in args.accounts:
+            with tempfile.TemporaryDirectory() as workdir:
+                port = free_port()
+                mock_url = f"http://127.0.0.1:{port}"
+                with open(os.path.join(workdir, "accounts.json"), "w") as f:
+                    json.dump(generate_accounts(accounts_count), f, indent=4)
+
+                mock = subprocess.Popen(
+                    [
+                        sys.executable, os.path.join(ROOT_PATH, "modules", "mock", "exchange.py"),
+                        "--port", str(port),
+                        "--tick", str(args.tick * args.time_scale),
+                        "--volatility", str(args.volatility),
+                    ],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                try:
+                    for _ in range(50):
+                        try:
+                            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                            break
+                        except OSError:
+                            time.sleep(0.1)
+
+                    result_path = os.path.join(workdir, "result.json")
+                    env = {
+                        **os.environ,
+                        "PYTHONPATH": ROOT_PATH,
+                        "BACKPACK_URL": mock_url,
+                        "BACKPACK_WS_URL": f"ws://127.0.0.1:{port}/ws",
+                    }
+                    print(f"Benchmark | {mode} with {accounts_count} accounts for {args.duration}s...")
+                    subprocess.run(
+                        [
+                            sys.executable, "-m", "modules.mock.benchmark", "--child",
+                            "--modes", mode,
+                            "--accounts", str(accounts_count),
+                            "--duration", str(args.duration),
+                            "--time-scale", str(args.time_scale),
+                            "--mock-url", mock_url,
+                            "--result", result_path,
+                        ],
+                        cwd=workdir,
+                        env=env,
+                        stdout=None if args.verbose else subprocess.DEVNULL,
+                        stderr=None if args.verbose else subprocess.DEVNULL,
+                    )
+                    if os.path.exists(result_path):
+                        with open(result_path, "r") as f:
+                            report["scenarios"].append(json.load(f))
+                    else:
+                        report["scenarios"].append({"mode": mode, "accounts": accounts_count, "error": "scenario failed"})
+                finally:
+                    mock.terminate()
+                    mock.wait()
+
+    return report
+
+
+def compare_reports(old: dict, new: dict) -> list[str]:
+    lines = [f"Comparing {old['commit']} -> {new['commit']}"]
+    old_scenarios = {(s["mode"], s["accounts"]): s for s in old["scenarios"]}
+    for scenario in new["scenarios"]:
+        previous = old_scenarios.get((scenario["mode"], scenario["accounts"]))
+        if not previous or "error" in scenario or "error" in previous:
+            continue
+        lines.append(f"{scenario['mode']} x{scenario['accounts']}:")
+        for key in ("api_calls_per_cycle", "api_calls_per_minute", "orders_per_minute", "peak_rss_mb"):
+            if previous.get(key) is not None and scenario.get(key) is not None:
+                lines.append(f"  {key}: {previous[key]} -> {scenario[key]}")
+        for key in ("detection_latency", "loop_lag"):
+            lines.append(f"  {key} p99: {previous[key]['p99']} -> {scenario[key]['p99']}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmark of the trading modes against the mock exchange")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--accounts", nargs="+", type=int, default=[10, 100, 1000])
+    parser.add_argument("--duration", type=float, default=120, help="seconds to run every scenario")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="multiplier applied to every bot sleep")
+    parser.add_argument("--tick", type=float, default=1, help="mock price step interval before scaling")
+    parser.add_argument("--volatility", type=float, default=0.002)
+    parser.add_argument("--output", help="report path, defaults to database/benchmarks/<commit>_<timestamp>.json")
+    parser.add_argument("--compare", help="previous report to compare against")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mock-url", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.mode = args.modes[0]
+        return run_child(args)
+
+    report = run_benchmarks(args)
+    output = args.output or os.path.join(ROOT_PATH, REPORTS_PATH, f"{report['commit']}_{report['timestamp']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Benchmark | Report saved to {output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            print("\n".join(compare_reports(json.load(f), report)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,706 @@
+import json
+import random
+import asyncio
+import argparse
+from base64 import b64encode, b64decode
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from hashlib import sha256
+from itertools import count
+from json import dumps
+from time import time
+
+import base58
+from aiohttp import web, WSMsgType
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+
+MOCK_MARKETS = {
+    "BTC": {"price": 95000, "tick_size": "0.1", "step_size": "0.00001", "max_leverage": 50},
+    "ETH": {"price": 3300, "tick_size": "0.01", "step_size": "0.0001", "max_leverage": 50},
+    "SOL": {"price": 180, "tick_size": "0.01", "step_size": "0.01", "max_leverage": 50},
+    "JUP": {"price": 0.8, "tick_size": "0.0001", "step_size": "1", "max_leverage": 10},
+    "BNB": {"price": 650, "tick_size": "0.01", "step_size": "0.001", "max_leverage": 10},
+    "HYPE": {"price": 20, "tick_size": "0.001", "step_size": "0.01", "max_leverage": 10},
+    "SUI": {"price": 3.5, "tick_size": "0.0001", "step_size": "0.1", "max_leverage": 10},
+    "XRP": {"price": 2.5, "tick_size": "0.0001", "step_size": "0.1", "max_leverage": 10},
+}
+
+INSTRUCTIONS = {
+    ("GET", "/api/v1/account"): "accountQuery",
+    ("PATCH", "/api/v1/account"): "accountUpdate",
+    ("GET", "/api/v1/account/limits/order"): "maxOrderQuantity",
+    ("GET", "/api/v1/account/limits/withdrawal"): "maxWithdrawalQuantity",
+    ("GET", "/api/v1/capital"): "balanceQuery",
+    ("GET", "/api/v1/capital/collateral"): "collateralQuery",
+    ("POST", "/api/v1/order"): "orderExecute",
+    ("POST", "/api/v1/orders"): "orderExecute",
+    ("GET", "/api/v1/position"): "positionQuery",
+    ("GET", "/api/v1/borrowLend/positions"): "borrowLendPositionQuery",
+    ("GET", "/wapi/v1/history/fills"): "fillHistoryQueryAll",
+    ("POST", "/wapi/v1/capital/withdrawals"): "withdraw",
+    ("GET", "/wapi/v1/capital/deposit/address"): "depositAddressQuery",
+}
+
+
+def decimals(value: str) -> int:
+    return len(value.split(".")[1]) if "." in value else 0
+
+
+def round_down(value: float, step: str) -> float:
+    step_value = float(step)
+    return round(int(value / step_value + 1e-9) * step_value, decimals(step))
+
+
+def iso_timestamp(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None).isoformat(timespec="milliseconds")
+
+
+def deposit_address(api_key: str) -> str:
+    return base58.b58encode(sha256(api_key.encode()).digest()).decode()
+
+
+def generate_keypair() -> tuple[str, str]:
+    private_key = Ed25519PrivateKey.generate()
+    secret = b64encode(private_key.private_bytes_raw()).decode()
+    api_key = b64encode(private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)).decode()
+    return api_key, secret
+
+
+def generate_accounts(number: int) -> dict:
+    accounts = {}
+    for i in range(1, number + 1):
+        main_key, main_secret = generate_keypair()
+        sub_key, sub_secret = generate_keypair()
+        accounts[f"backpack_{i}"] = {
+            "backpack_api": main_key,
+            "backpack_secret": main_secret,
+            "backpack_sub-account_api": sub_key,
+            "backpack_sub-account_secret": sub_secret,
+            "proxy": "",
+        }
+    return accounts
+
+
+class MockError(Exception):
+    def __init__(self, status: int, code: str, message: str):
+        self.status = status
+        self.code = code
+        super().__init__(message)
+
+
+@dataclass
+class MockMarket:
+    base: str
+    price: float
+    tick_size: str
+    step_size: str
+    max_leverage: int
+    volatility: float
+
+    @property
+    def symbol(self) -> str:
+        return f"{self.base}_USDC_PERP"
+
+    @property
+    def mmf(self) -> float:
+        return 1 / self.max_leverage / 2
+
+
+@dataclass
+class MockPosition:
+    symbol: str
+    position_id: int
+    quantity: float = 0.0
+    entry_price: float = 0.0
+    realized_pnl: float = 0.0
+
+
+@dataclass
+class MockAccount:
+    api_key: str
+    collateral: float
+    leverage_limit: int = 10
+    positions: dict[str, MockPosition] = field(default_factory=dict)
+    fills: list[dict] = field(default_factory=list)
+
+
+class MockExchange:
+    FEE_RATE = 0.0004
+    WINDOW_LIMIT = 60000
+
+    def __init__(
+            self,
+            initial_balance: float = 1000,
+            volatility: float = 0.001,
+            tick_interval: float = 1,
+            price_script: dict[str, list[float]] | None = None,
+            verify_signatures: bool = True,
+    ):
+        self.initial_balance = initial_balance
+        self.tick_interval = tick_interval
+        self.price_script = price_script or {}
+        self.verify_signatures = verify_signatures
+        self.markets = {
+            f"{base}_USDC_PERP": MockMarket(base=base, volatility=volatility, **params)
+            for base, params in MOCK_MARKETS.items()
+        }
+        self.accounts: dict[str, MockAccount] = {}
+        self.addresses: dict[str, str] = {}
+        self.subscribers: dict[web.WebSocketResponse, tuple[set[str], str | None]] = {}
+        self.ids = count(1)
+        self.step = 0
+        self.liquidations: list[dict] = []
+        self.orders = 0
+
+    def get_account(self, api_key: str) -> MockAccount:
+        account = self.accounts.get(api_key)
+        if account is None:
+            account = self.accounts[api_key] = MockAccount(api_key=api_key, collateral=self.initial_balance)
+            self.addresses[deposit_address(api_key)] = api_key
+        return account
+
+    def get_market(self, symbol: str) -> MockMarket:
+        market = self.markets.get(symbol)
+        if market is None:
+            raise MockError(400, "INVALID_MARKET", f"Market {symbol} not found")
+        return market
+
+    def verify(self, request: web.Request, params: dict) -> str:
+        api_key = request.headers.get("X-API-Key")
+        if not api_key:
+            raise MockError(401, "UNAUTHORIZED", "Missing API key")
+        if not self.verify_signatures:
+            return api_key
+
+        instruction = INSTRUCTIONS.get((request.method, request.path))
+        timestamp = request.headers.get("X-Timestamp", "")
+        window = request.headers.get("X-Window", "")
+        if not timestamp.isdigit() or not window.isdigit() or int(window) > self.WINDOW_LIMIT:
+            raise MockError(400, "INVALID_CLIENT_REQUEST", "Invalid timestamp or window")
+        if abs(time() * 1e3 - int(timestamp)) > int(window):
+            raise MockError(400, "INVALID_CLIENT_REQUEST", "Request has expired")
+
+        str_body = "&".join(
+            f"instruction={instruction}&" + "&".join(
+                f"{key}={dumps(value) if type(value) == bool else value.lower() if value in ('True', 'False') else value}"
+                for key, value in sorted(order.items())
+            )
+            for order in (params if isinstance(params, list) else [params])
+        )
+        str_body = str_body.rstrip("&") + f"&timestamp={timestamp}&window={window}"
+        try:
+            Ed25519PublicKey.from_public_bytes(b64decode(api_key)).verify(
+                b64decode(request.headers.get("X-Signature", "")),
+                str_body.encode()
+            )
+        except (InvalidSignature, ValueError):
+            raise MockError(401, "UNAUTHORIZED", "Invalid signature")
+        return api_key
+
+    def unrealized_pnl(self, position: MockPosition) -> float:
+        return (self.markets[position.symbol].price - position.entry_price) * position.quantity
+
+    def equity(self, account: MockAccount) -> float:
+        return account.collateral + sum(self.unrealized_pnl(pos) for pos in account.positions.values())
+
+    def initial_margin(self, account: MockAccount, extra: dict[str, float] = None) -> float:
+        quantities = {symbol: pos.quantity for symbol, pos in account.positions.items()}
+        for symbol, quantity in (extra or {}).items():
+            quantities[symbol] = quantities.get(symbol, 0) + quantity
+        return sum(
+            abs(quantity) * self.markets[symbol].price / min(account.leverage_limit, self.markets[symbol].max_leverage)
+            for symbol, quantity in quantities.items()
+        )
+
+    def maintenance_margin(self, account: MockAccount) -> float:
+        return sum(
+            abs(pos.quantity) * self.markets[pos.symbol].price * self.markets[pos.symbol].mmf
+            for pos in account.positions.values()
+        )
+
+    def available_equity(self, account: MockAccount) -> float:
+        return self.equity(account) - self.initial_margin(account)
+
+    def liquidation_price(self, account: MockAccount, position: MockPosition) -> float:
+        market = self.markets[position.symbol]
+        buffer = self.equity(account) - self.maintenance_margin(account)
+        denominator = position.quantity * (1 - market.mmf if position.quantity > 0 else 1 + market.mmf)
+        return max(market.price - buffer / denominator, 0) if denominator else 0
+
+    def position_payload(self, account: MockAccount, position: MockPosition) -> dict:
+        market = self.markets[position.symbol]
+        notional = position.quantity * market.price
+        return {
+            "symbol": position.symbol,
+            "positionId": str(position.position_id),
+            "breakEvenPrice": f"{position.entry_price:.8f}",
+            "entryPrice": f"{position.entry_price:.8f}",
+            "estLiquidationPrice": f"{self.liquidation_price(account, position):.8f}",
+            "markPrice": f"{market.price:.8f}",
+            "imf": f"{1 / min(account.leverage_limit, market.max_leverage):.4f}",
+            "mmf": f"{market.mmf:.4f}",
+            "netCost": f"{position.quantity * position.entry_price:.8f}",
+            "netQuantity": f"{position.quantity:.8f}",
+            "netExposureQuantity": f"{abs(position.quantity):.8f}",
+            "netExposureNotional": f"{notional:.8f}",
+            "pnlRealized": f"{position.realized_pnl:.8f}",
+            "pnlUnrealized": f"{self.unrealized_pnl(position):.8f}",
+        }
+
+    def execute(self, account: MockAccount, market: MockMarket, side: str, quantity: float, liquidation=False) -> dict:
+        signed_quantity = quantity if side == "Bid" else -quantity
+        price = market.price
+        position = account.positions.get(market.symbol)
+        if position is None:
+            position = account.positions[market.symbol] = MockPosition(market.symbol, next(self.ids))
+            event = "positionOpened"
+        else:
+            event = "positionAdjusted"
+
+        if position.quantity * signed_quantity >= 0:
+            total = position.quantity + signed_quantity
+            position.entry_price = (position.entry_price * position.quantity + price * signed_quantity) / total
+            position.quantity = total
+        else:
+            closed = min(abs(signed_quantity), abs(position.quantity))
+            pnl = (price - position.entry_price) * closed * (1 if position.quantity > 0 else -1)
+            account.collateral += pnl
+            position.realized_pnl += pnl
+            position.quantity += signed_quantity
+            if abs(position.quantity) < 1e-12:
+                position.quantity = 0
+            elif position.quantity * signed_quantity > 0:
+                position.entry_price = price
+
+        fee = abs(quantity) * price * self.FEE_RATE
+        account.collateral -= fee
+
+        order_id = str(next(self.ids))
+        fill = {
+            "tradeId": next(self.ids),
+            "orderId": order_id,
+            "symbol": market.symbol,
+            "side": side,
+            "price": f"{price:.8f}",
+            "quantity": f"{quantity:.8f}",
+            "fee": f"{fee:.8f}",
+            "feeSymbol": "USDC",
+            "isMaker": False,
+            "systemOrderType": "LiquidatePositionOnBook" if liquidation else None,
+            "timestamp": iso_timestamp(time()),
+        }
+        account.fills.append(fill)
+
+        if position.quantity == 0:
+            del account.positions[market.symbol]
+            event = "positionClosed"
+        self.publish_position(account, position, event)
+        self.publish_account(account, "account.orderUpdate", {
+            "e": "orderFill",
+            "E": int(time() * 1e6),
+            "s": market.symbol,
+            "S": side,
+            "o": "Market",
+            "X": "Filled",
+            "i": order_id,
+            "q": fill["quantity"],
+            "z": fill["quantity"],
+            "Z": f"{quantity * price:.8f}",
+            "l": fill["quantity"],
+            "L": fill["price"],
+            "n": fill["fee"],
+            "N": "USDC",
+            "t": fill["tradeId"],
+            "T": int(time() * 1e6),
+        })
+        return {"id": order_id, "price": price, "fill": fill}
+
+    def place_order(self, account: MockAccount, payload: dict) -> dict:
+        market = self.get_market(payload.get("symbol"))
+        side = payload.get("side")
+        if side not in ("Bid", "Ask"):
+            raise MockError(400, "INVALID_ORDER", "Invalid side")
+        if payload.get("orderType") != "Market":
+            raise MockError(400, "INVALID_ORDER", "Only market orders are supported")
+
+        if payload.get("quantity"):
+            quantity = round_down(float(payload["quantity"]), market.step_size)
+        elif payload.get("quoteQuantity"):
+            quantity = round_down(float(payload["quoteQuantity"]) / market.price, market.step_size)
+        else:
+            raise MockError(400, "INVALID_ORDER", "Quantity is required")
+        if quantity <= 0:
+            raise MockError(400, "INVALID_ORDER", "Quantity is below the minimum")
+
+        position = account.positions.get(market.symbol)
+        current = position.quantity if position else 0
+        signed_quantity = quantity if side == "Bid" else -quantity
+        if payload.get("reduceOnly") in (True, "true"):
+            if current * signed_quantity >= 0:
+                raise MockError(400, "INVALID_ORDER", "Reduce only order not reduced")
+            quantity = min(quantity, abs(current))
+            signed_quantity = quantity if side == "Bid" else -quantity
+
+        increases = abs(current + signed_quantity) > abs(current)
+        if increases and self.initial_margin(account, {market.symbol: signed_quantity}) > self.equity(account):
+            raise MockError(400, "INSUFFICIENT_MARGIN", "Insufficient margin")
+
+        result = self.execute(account, market, side, quantity)
+        self.orders += 1
+        return {
+            "id": result["id"],
+            "clientId": payload.get("clientId"),
+            "orderType": "Market",
+            "side": side,
+            "symbol": market.symbol,
+            "status": "Filled",
+            "quantity": f"{quantity:.8f}",
+            "executedQuantity": f"{quantity:.8f}",
+            "executedQuoteQuantity": f"{quantity * result['price']:.8f}",
+            "reduceOnly": payload.get("reduceOnly", False),
+            "createdAt": int(time() * 1e3),
+            "timeInForce": "GTC",
+        }
+
+    def max_order_quantity(self, account: MockAccount, market: MockMarket, side: str) -> float:
+        position = account.positions.get(market.symbol)
+        current = position.quantity if position else 0
+        leverage = min(account.leverage_limit, market.max_leverage)
+        quantity = max(self.available_equity(account), 0) * leverage / market.price
+        if (side == "Bid" and current < 0) or (side == "Ask" and current > 0):
+            quantity += abs(current)
+        return round_down(quantity, market.step_size)
+
+    def withdrawable(self, account: MockAccount) -> float:
+        return max(min(account.collateral, self.available_equity(account)), 0)
+
+    def withdraw(self, account: MockAccount, payload: dict) -> dict:
+        quantity = float(payload.get("quantity", 0))
+        if payload.get("symbol") != "USDC":
+            raise MockError(400, "INVALID_ASSET", "Only USDC withdrawals are supported")
+        if quantity <= 0 or quantity > self.withdrawable(account) + 1e-9:
+            raise MockError(400, "INSUFFICIENT_FUNDS", "Insufficient funds")
+
+        account.collateral -= quantity
+        recipient = self.addresses.get(payload.get("address"))
+        if recipient is not None:
+            self.accounts[recipient].collateral += quantity
+
+        return {
+            "id": next(self.ids),
+            "blockchain": payload.get("blockchain", "Solana"),
+            "quantity": f"{quantity:.8f}",
+            "fee": "0",
+            "symbol": "USDC",
+            "status": "confirmed",
+            "toAddress": payload.get("address"),
+            "createdAt": iso_timestamp(time()),
+        }
+
+    def fills_history(self, account: MockAccount, params: dict) -> list[dict]:
+        fills = account.fills
+        if params.get("fillType") in ("Liquidation", "AllLiquidation"):
+            fills = [fill for fill in fills if fill["systemOrderType"]]
+        if params.get("from"):
+            start = int(params["from"]) / 1e3
+            fills = [fill for fill in fills if datetime.fromisoformat(fill["timestamp"]).replace(tzinfo=timezone.utc).timestamp() >= start]
+        if params.get("to"):
+            end = int(params["to"]) / 1e3
+            fills = [fill for fill in fills if datetime.fromisoformat(fill["timestamp"]).replace(tzinfo=timezone.utc).timestamp() < end]
+        if params.get("sortDirection", "Desc") == "Desc":
+            fills = fills[::-1]
+
+        offset = int(params.get("offset", 0))
+        limit = min(int(params.get("limit", 100)), 1000)
+        return fills[offset:offset + limit]
+
+    def step_prices(self):
+        self.step += 1
+        for market in self.markets.values():
+            script = self.price_script.get(market.base)
+            if script:
+                market.price = float(script[self.step % len(script)])
+            else:
+                market.price *= 1 + random.gauss(0, market.volatility)
+            self.publish(f"ticker.{market.symbol}", {
+                "e": "ticker",
+                "E": int(time() * 1e6),
+                "s": market.symbol,
+                "c": f"{market.price:.8f}",
+            })
+            self.publish(f"markPrice.{market.symbol}", {
+                "e": "markPrice",
+                "E": int(time() * 1e6),
+                "s": market.symbol,
+                "p": f"{market.price:.8f}",
+            })
+
+        for account in self.accounts.values():
+            if not account.positions:
+                continue
+            if self.equity(account) < self.maintenance_margin(account):
+                self.liquidate(account)
+            else:
+                for position in account.positions.values():
+                    self.publish_position(account, position, "positionAdjusted")
+
+    def liquidate(self, account: MockAccount):
+        for position in list(account.positions.values()):
+            market = self.markets[position.symbol]
+            self.liquidations.append({"time": time(), "api_key": account.api_key, "symbol": position.symbol})
+            side = "Ask" if position.quantity > 0 else "Bid"
+            self.execute(account, market, side, abs(position.quantity), liquidation=True)
+
+    def publish(self, stream: str, data: dict, api_key: str | None = None):
+        message = None
+        for ws, (streams, owner) in list(self.subscribers.items()):
+            if stream not in streams or (api_key is not None and owner != api_key):
+                continue
+            if message is None:
+                message = json.dumps({"stream": stream, "data": data})
+            asyncio.create_task(self._send(ws, message))
+
+    def publish_account(self, account: MockAccount, stream: str, data: dict):
+        self.publish(stream, data, account.api_key)
+
+    def publish_position(self, account: MockAccount, position: MockPosition, event: str):
+        if not self.subscribers:
+            return
+        payload = self.position_payload(account, position)
+        self.publish_account(account, "account.positionUpdate", {
+            "e": event,
+            "E": int(time() * 1e6),
+            "s": position.symbol,
+            "b": payload["breakEvenPrice"],
+            "B": payload["entryPrice"],
+            "l": payload["estLiquidationPrice"],
+            "f": payload["imf"],
+            "M": payload["markPrice"],
+            "m": payload["mmf"],
+            "q": payload["netQuantity"],
+            "Q": payload["netExposureQuantity"],
+            "n": payload["netExposureNotional"],
+            "i": payload["positionId"],
+            "p": payload["pnlRealized"],
+            "P": payload["pnlUnrealized"],
+            "T": int(time() * 1e6),
+        })
+
+    async def _send(self, ws: web.WebSocketResponse, message: str):
+        try:
+            await ws.send_str(message)
+        except (ConnectionError, RuntimeError):
+            self.subscribers.pop(ws, None)
+
+    async def price_loop(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            self.step_prices()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        try:
+            params = dict(request.query)
+            if request.can_read_body:
+                body = await request.json()
+                params = body if isinstance(body, list) else {**params, **body}
+            return web.json_response(self.route(request, params))
+        except MockError as e:
+            return web.json_response({"code": e.code, "message": str(e)}, status=e.status)
+        except (KeyError, ValueError) as e:
+            return web.json_response({"code": "INVALID_CLIENT_REQUEST", "message": str(e)}, status=400)
+
+    def route(self, request: web.Request, params: dict):
+        key = (request.method, request.path)
+
+        if key == ("GET", "/api/v1/markets"):
+            return [
+                {
+                    "symbol": market.symbol,
+                    "baseSymbol": market.base,
+                    "quoteSymbol": "USDC",
+                    "marketType": "PERP",
+                    "filters": {
+                        "price": {"minPrice": market.tick_size, "tickSize": market.tick_size},
+                        "quantity": {"minQuantity": market.step_size, "stepSize": market.step_size},
+                        "leverage": {"maxLeverage": str(market.max_leverage)},
+                    },
+                    "imfFunction": {"base": f"{1 / market.max_leverage:.4f}"},
+                    "mmfFunction": {"base": f"{market.mmf:.4f}"},
+                }
+                for market in self.markets.values()
+            ]
+        if key == ("GET", "/api/v1/tickers"):
+            return [
+                {"symbol": symbol, "lastPrice": f"{market.price:.8f}"}
+                for market in self.markets.values()
+                for symbol in (market.symbol, f"{market.base}_USDC")
+            ]
+        if key not in INSTRUCTIONS:
+            raise MockError(404, "NOT_FOUND", f"{request.method} {request.path} is not supported")
+
+        account = self.get_account(self.verify(request, params))
+
+        if key == ("GET", "/api/v1/account"):
+            return {
+                "leverageLimit": str(account.leverage_limit),
+                "autoLend": False,
+                "autoRepayBorrows": False,
+                "autoBorrowSettlements": True,
+                "autoRealizePnl": True,
+            }
+        if key == ("PATCH", "/api/v1/account"):
+            if "leverageLimit" in params:
+                account.leverage_limit = int(params["leverageLimit"])
+            return None
+        if key == ("GET", "/api/v1/account/limits/order"):
+            market = self.get_market(params["symbol"])
+            return {"maxOrderQuantity": f"{self.max_order_quantity(account, market, params['side']):.8f}"}
+        if key == ("GET", "/api/v1/account/limits/withdrawal"):
+            return {"maxWithdrawalQuantity": f"{self.withdrawable(account):.8f}"}
+        if key == ("GET", "/api/v1/capital"):
+            return {"USDC": {"available": f"{max(account.collateral, 0):.8f}", "locked": "0", "staked": "0"}}
+        if key == ("GET", "/api/v1/capital/collateral"):
+            equity = self.equity(account)
+            return {
+                "netEquity": f"{equity:.8f}",
+                "netEquityAvailable": f"{self.available_equity(account):.8f}",
+                "netEquityLocked": f"{self.initial_margin(account):.8f}",
+                "mmf": f"{self.maintenance_margin(account) / equity if equity > 0 else 0:.8f}",
+                "borrowLiability": f"{max(-account.collateral, 0):.8f}",
+                "collateral": [{
+                    "symbol": "USDC",
+                    "totalQuantity": f"{max(account.collateral, 0):.8f}",
+                    "availableQuantity": f"{max(account.collateral, 0):.8f}",
+                    "lendQuantity": "0",
+                    "openOrderQuantity": "0",
+                    "collateralWeight": "1",
+                    "collateralValue": f"{max(account.collateral, 0):.8f}",
+                }],
+            }
+        if key == ("POST", "/api/v1/order"):
+            return self.place_order(account, params)
+        if key == ("POST", "/api/v1/orders"):
+            results = []
+            for order in params:
+                try:
+                    results.append(self.place_order(account, order))
+                except MockError as e:
+                    results.append({"code": e.code, "message": str(e)})
+            return results
+        if key == ("GET", "/api/v1/position"):
+            return [self.position_payload(account, position) for position in account.positions.values()]
+        if key == ("GET", "/api/v1/borrowLend/positions"):
+            if account.collateral >= 0:
+                return []
+            return [{"symbol": "USDC", "netExposureQuantity": f"{account.collateral:.8f}"}]
+        if key == ("GET", "/wapi/v1/history/fills"):
+            return self.fills_history(account, params)
+        if key == ("POST", "/wapi/v1/capital/withdrawals"):
+            return self.withdraw(account, params)
+        if key == ("GET", "/wapi/v1/capital/deposit/address"):
+            return {"address": deposit_address(account.api_key)}
+
+    async def handle_state(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "step": self.step,
+            "accounts": len(self.accounts),
+            "orders": self.orders,
+            "open_positions": sum(len(account.positions) for account in self.accounts.values()),
+            "liquidations": self.liquidations,
+        })
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        self.subscribers[ws] = (set(), None)
+
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                break
+            message = json.loads(msg.data)
+            streams, owner = self.subscribers[ws]
+            if message.get("method") == "SUBSCRIBE":
+                signature = message.get("signature")
+                if signature:
+                    api_key, encoded_signature, timestamp, window = signature
+                    try:
+                        Ed25519PublicKey.from_public_bytes(b64decode(api_key)).verify(
+                            b64decode(encoded_signature),
+                            f"instruction=subscribe&timestamp={timestamp}&window={window}".encode()
+                        )
+                    except (InvalidSignature, ValueError):
+                        await ws.send_json({"error": {"code": 4006, "message": "Invalid signature"}})
+                        continue
+                    owner = api_key
+                    self.get_account(api_key)
+                elif any(stream.startswith("account.") for stream in message.get("params", [])):
+                    await ws.send_json({"error": {"code": 4006, "message": "Signature required"}})
+                    continue
+                self.subscribers[ws] = (streams | set(message.get("params", [])), owner)
+            elif message.get("method") == "UNSUBSCRIBE":
+                self.subscribers[ws] = (streams - set(message.get("params", [])), owner)
+
+        self.subscribers.pop(ws, None)
+        return ws
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/ws", self.handle_ws)
+        app.router.add_get("/mock/state", self.handle_state)
+        app.router.add_route("*", "/{tail:.*}", self.handle)
+
+        async def start_price_loop(app: web.Application):
+            app["price_loop"] = asyncio.create_task(self.price_loop())
+
+        async def stop_price_loop(app: web.Application):
+            app["price_loop"].cancel()
+
+        app.on_startup.append(start_price_loop)
+        app.on_cleanup.append(stop_price_loop)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> web.AppRunner:
+        runner = web.AppRunner(self.create_app())
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Backpack exchange API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--balance", type=float, default=1000, help="initial USDC collateral of every account")
+    parser.add_argument("--volatility", type=float, default=0.001, help="random walk step deviation")
+    parser.add_argument("--tick", type=float, default=1, help="seconds between price steps")
+    parser.add_argument("--prices", help="JSON file with scripted prices: {\"SOL\": [180, 179.5, ...]}")
+    parser.add_argument("--generate-accounts", type=int, metavar="N", help="write N mock account pairs to accounts.json and exit")
+    parser.add_argument("--accounts-path", default="accounts.json")
+    args = parser.parse_args()
+
+    if args.generate_accounts:
+        with open(args.accounts_path, "w") as f:
+            json.dump(generate_accounts(args.generate_accounts), f, indent=4)
+        print(f"Saved {args.generate_accounts} mock accounts to {args.accounts_path}")
+        return
+
+    price_script = None
+    if args.prices:
+        with open(args.prices, "r") as f:
+            price_script = json.load(f)
+
+    exchange = MockExchange(
+        initial_balance=args.balance,
+        volatility=args.volatility,
+        tick_interval=args.tick,
+        price_script=price_script,
+    )
+    print(f"Mock Backpack exchange on http://{args.host}:{args.port}, set BACKPACK_URL=http://{args.host}:{args.port} BACKPACK_WS_URL=ws://{args.host}:{args.port}/ws")
+    web.run_app(exchange.create_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()
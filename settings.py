@@ -2,6 +2,20 @@ TG_API = ''  # API ключ для телеграм бота @BotFather
 TG_CHAT_ID = ''  # ваш ID в телеграмме для получения сообщений @getidsbot
 
 RETRY = 3  # количество попыток при ошибке
+FLATTEN_ON_STOP = False  # закрывать позиции режимов ликвидаций (2 и 3 mode) при остановке софта (Ctrl+C/SIGTERM), при False позиции остаются открытыми и продолжают отслеживаться после перезапуска
+
+RATE_LIMITS = {  # ограничения частоты запросов к Backpack: [запросов в секунду, размер всплеска], выставьте [0, 0] что бы отключить лимит
+    'api_key': [5, 10],  # на один API ключ
+    'proxy': [10, 20],  # на один прокси (без прокси - на ваш IP)
+    'instruction': [5, 10],  # на один тип запроса (api_instruction) через один прокси
+    'max_in_flight': 50,  # максимальное количество одновременных запросов
+}
+
+LIQUIDATION_POLLING = {  # распределение проверок позиций в режимах ликвидаций (2 и 3 mode)
+    'requests_per_second': 5,  # общее количество проверок позиций в секунду на все аккаунты, не растет с количеством позиций
+    'fast_lane_distance': 0.005,  # позиции, у которых до цены ликвидации меньше этой доли цены, проверяются в быстрой очереди
+    'fast_lane_share': 0.7,  # доля проверок, отдаваемая быстрой очереди
+}
 
 ORDERS_TIMEOUT = [10, 50]  # задержка между закрытием и открытием позиций (сек)
 POSITIONS_TIMEOUT = [100, 200]  # задержка между трейдинг кругами (сек)
@@ -32,6 +46,7 @@ DELTA_NEUTRAL_SETTINGS = {
     'partial_liquidation_timeout': 5,  # при частичной ликвидации, если через N минут позцию полностью не выбило - софт закрывает пару
     'tokens': ['BTC', 'SOL', 'ETH'],  # токены для торговли ['BTC', 'SOL', 'ETH', 'JUP', 'BNB', 'HYPE', 'SUI', 'XRP']
     'size_variation': [0.02, 0.1],  # коффициент разницы между шортами
+    'poll_interval': [2, 15],  # мин/макс интервал проверки позиций пары (сек), сокращается при приближении к ликвидации
 }
 
 # --------- 3 mode ----------
@@ -43,6 +58,7 @@ DEFAULT_LIQUIDATION_SETTINGS = {
     'reinvest_pnl_threshold': 30,  # порог пнлки для реинвестирования, поставьте 0 чтобы отключить
     'tokens': ['BTC', 'SOL', 'ETH', 'JUP', 'BNB', 'HYPE', 'SUI', 'XRP'],  # токены для торговли ['BTC', 'SOL', 'ETH', 'JUP', 'BNB', 'HYPE', 'SUI', 'XRP']
     'account_delay': [10, 20],  # задержка между запуском аккаунтов (сек)
+    'poll_interval': [1, 30],  # мин/макс интервал проверки позиций аккаунта (сек), сокращается при приближении к ликвидации
 }
 
 # --------- OKX API ----------